@@ -56,6 +56,8 @@ class ConfigGUI(tk.Tk):
         home_dir = Path.home()
         log_file_path = str(Path(__file__).parent / '設定・履歴/log.json')
         token_file_path = str(Path(__file__).parent / '設定・履歴/token.json')
+        archive_file_path = str(Path(__file__).parent / '設定・履歴/archive.db')
+        metadata_cache_path = str(Path(__file__).parent / '設定・履歴/metadata_cache.db')
 
         # 基本的な設定項目を辞書として定義
         base_config = {
@@ -63,6 +65,12 @@ class ConfigGUI(tk.Tk):
             "create_playlist_folder": True,
             "enable_logging": True,
             "log_file_path": log_file_path,
+            "archive_path": archive_file_path,
+            "enable_metadata_cache": True,
+            "metadata_cache_path": metadata_cache_path,
+            "metadata_cache_playlist_ttl": 3600,
+            "metadata_cache_video_ttl": 21600,
+            "metadata_cache_max_mb": 64,
             "enable_volume_adjustment": False,
             "volume_level": 1.0,
             "enable_notion_upload": False,
@@ -72,6 +80,28 @@ class ConfigGUI(tk.Tk):
             "cookie_browser": "chrome",
             "cookie_file_path": "",
             "mark_as_watched": False,
+            "workers": 4,
+            "min_workers": 1,
+            "max_workers": 8,
+            "sort_workers": 2,
+            "postprocess_workers": 0,  # 0はCPUコア数
+            "ffmpeg_threads": 0,  # 0はコア数を後処理の並列数で割った値
+            "encoding_preset": "",  # fast/balanced/archive。空欄はyt-dlpの既定値。ディレクトリごとに上書き可能
+            "concurrent_fragments": 4,  # ディレクトリごとに上書き可能
+            "http_chunk_size": "",  # 例: "10M"。空欄は無効
+            "buffer_size": "",  # 例: "16K"。空欄はyt-dlpの既定値
+            "max_connections": 16,  # フラグメント数×並列ダウンロード数の上限
+            "max_rate": "",  # 例: "5M"。空欄は無制限
+            "rate_limit_schedule": [],  # 例: [{"start": "23:00", "end": "07:00", "max_rate": ""}]
+            "retry_max_attempts": 4,  # 一時的なエラー・レート制限時の最大試行回数
+            "retry_base_delay": 5,  # 再試行の待機時間の基準（秒）。失敗ごとに倍増
+            "retry_max_delay": 300,
+            "sync_stop_after": 10,  # --sync時、同期済みの動画がこの件数続いたら列挙を終了
+            "staging_fallback_dir": "",  # 保存先と同じデバイスに一時ディレクトリを作れない場合の代替先
+            "daemon_port": 8799,
+            "enable_metrics": True,  # ステージごとの処理時間を設定・履歴/metrics.jsonlに記録
+            "metrics_textfile": "",  # 例: "/var/lib/node_exporter/textfile/youtubedler.prom"
+            "log_retention_days": 90,  # 解決済みのエラーログを保持する日数（0で削除しない）
             "directories": [
                 {"path": str(home_dir / "Music"), "format": "mp3"},
                 {"path": str(home_dir / "Videos"), "format": "webm"},
@@ -122,6 +152,15 @@ class ConfigGUI(tk.Tk):
         self.cookie_browser_var = tk.StringVar(value=self.config_data.get('cookie_browser'))
         self.cookie_file_path_var = tk.StringVar(value=self.config_data.get('cookie_file_path', ''))
         self.mark_as_watched_var = tk.BooleanVar(value=self.config_data.get('mark_as_watched', False))
+        self.workers_var = tk.IntVar(value=self.config_data.get('workers', 4))
+        self.min_workers_var = tk.IntVar(value=self.config_data.get('min_workers', 1))
+        self.max_workers_var = tk.IntVar(value=self.config_data.get('max_workers', 8))
+        self.concurrent_fragments_var = tk.IntVar(value=self.config_data.get('concurrent_fragments', 4))
+        self.http_chunk_size_var = tk.StringVar(value=self.config_data.get('http_chunk_size', ''))
+        self.buffer_size_var = tk.StringVar(value=self.config_data.get('buffer_size', ''))
+        self.max_connections_var = tk.IntVar(value=self.config_data.get('max_connections', 16))
+        self.max_rate_var = tk.StringVar(value=self.config_data.get('max_rate', ''))
+        self.encoding_preset_var = tk.StringVar(value=self.config_data.get('encoding_preset', ''))
 
         # Destination choice
         self.destination_var = tk.StringVar(value=self.config_data.get('destination', 'local'))
@@ -147,6 +186,15 @@ class ConfigGUI(tk.Tk):
             'cookie_browser': self.cookie_browser_var,
             'cookie_file_path': self.cookie_file_path_var,
             'mark_as_watched': self.mark_as_watched_var,
+            'workers': self.workers_var,
+            'min_workers': self.min_workers_var,
+            'max_workers': self.max_workers_var,
+            'concurrent_fragments': self.concurrent_fragments_var,
+            'http_chunk_size': self.http_chunk_size_var,
+            'buffer_size': self.buffer_size_var,
+            'max_connections': self.max_connections_var,
+            'max_rate': self.max_rate_var,
+            'encoding_preset': self.encoding_preset_var,
             'destination': self.destination_var,
             'google_drive_parent_folder_id': self.gdrive_parent_id_var,
             'google_drive_credentials_path': self.gdrive_credentials_path_var,
@@ -245,6 +293,44 @@ class ConfigGUI(tk.Tk):
         ttk.Combobox(quality_frame, textvariable=self.video_quality_var, values=quality_options).pack(side='left', padx=5)
         ttk.Label(quality_frame, text='("best", "1080"など。指定解像度以下の最大画質)').pack(side='left', anchor='w')
 
+        # 並列ダウンロード数の設定
+        workers_frame = ttk.Frame(other_frame)
+        workers_frame.pack(fill='x', pady=(5, 5))
+        ttk.Label(workers_frame, text='並列ダウンロード数 初期値:').pack(side='left', anchor='w')
+        ttk.Spinbox(workers_frame, from_=1, to=64, textvariable=self.workers_var, width=4).pack(side='left', padx=5)
+        ttk.Label(workers_frame, text='最小:').pack(side='left', anchor='w')
+        ttk.Spinbox(workers_frame, from_=1, to=64, textvariable=self.min_workers_var, width=4).pack(side='left', padx=5)
+        ttk.Label(workers_frame, text='最大:').pack(side='left', anchor='w')
+        ttk.Spinbox(workers_frame, from_=1, to=64, textvariable=self.max_workers_var, width=4).pack(side='left', padx=5)
+        ttk.Label(workers_frame, text='(スループットに応じて自動調整)').pack(side='left', anchor='w')
+
+        # フラグメント並列ダウンロードの設定（ディレクトリごとに上書き可能）
+        fragment_frame = ttk.Frame(other_frame)
+        fragment_frame.pack(fill='x', pady=(5, 5))
+        ttk.Label(fragment_frame, text='フラグメント並列数:').pack(side='left', anchor='w')
+        ttk.Spinbox(fragment_frame, from_=1, to=64, textvariable=self.concurrent_fragments_var, width=4).pack(side='left', padx=5)
+        ttk.Label(fragment_frame, text='チャンクサイズ:').pack(side='left', anchor='w')
+        ttk.Entry(fragment_frame, textvariable=self.http_chunk_size_var, width=6).pack(side='left', padx=5)
+        ttk.Label(fragment_frame, text='バッファ:').pack(side='left', anchor='w')
+        ttk.Entry(fragment_frame, textvariable=self.buffer_size_var, width=6).pack(side='left', padx=5)
+        ttk.Label(fragment_frame, text='同時接続数の上限:').pack(side='left', anchor='w')
+        ttk.Spinbox(fragment_frame, from_=1, to=256, textvariable=self.max_connections_var, width=4).pack(side='left', padx=5)
+        ttk.Label(fragment_frame, text='(サイズは"10M"など。空欄は無効)').pack(side='left', anchor='w')
+
+        # 帯域制限の設定（時間帯ごとの設定はconfig.jsonのrate_limit_scheduleで指定）
+        rate_frame = ttk.Frame(other_frame)
+        rate_frame.pack(fill='x', pady=(5, 5))
+        ttk.Label(rate_frame, text='帯域の上限 (1秒あたり):').pack(side='left', anchor='w')
+        ttk.Entry(rate_frame, textvariable=self.max_rate_var, width=8).pack(side='left', padx=5)
+        ttk.Label(rate_frame, text='("5M"など。空欄は無制限。ダウンロードとGoogle Driveへのアップロードで共有)').pack(side='left', anchor='w')
+
+        # 再エンコード時のプリセット（ディレクトリごとの設定はconfig.jsonのencoding_presetで指定）
+        preset_frame = ttk.Frame(other_frame)
+        preset_frame.pack(fill='x', pady=(5, 5))
+        ttk.Label(preset_frame, text='エンコードプリセット:').pack(side='left', anchor='w')
+        ttk.Combobox(preset_frame, textvariable=self.encoding_preset_var, values=['', 'fast', 'balanced', 'archive'], width=10, state='readonly').pack(side='left', padx=5)
+        ttk.Label(preset_frame, text='(fastは速度優先、archiveは品質・サイズ優先。空欄はffmpegの既定値)').pack(side='left', anchor='w')
+
         # プレイリストのディレクトリ作成設定
         ttk.Checkbutton(other_frame, text='プレイリストの場合、ディレクトリを作成する', variable=self.create_playlist_folder_var).pack(anchor='w', pady=2)
 
@@ -458,9 +544,18 @@ class ConfigGUI(tk.Tk):
 
         # フォーマット選択コンボボックス
         widgets['format_var'] = tk.StringVar(value=dir_info['format'])
-        widgets['format_combo'] = ttk.Combobox(row_frame, textvariable=widgets['format_var'], values=['mp3', 'mp4', 'webm', 'wav', 'flac'], width=8, state='readonly')
+        widgets['format_combo'] = ttk.Combobox(row_frame, textvariable=widgets['format_var'], values=['mp3', 'mp4', 'webm', 'wav', 'flac', 'webm,mp3', 'mp4,mp3'], width=10, state='readonly')
         widgets['format_combo'].pack(side='right', padx=(5, 0))
 
+        # GUIで編集しない項目（staging_dirなど）は保存時にそのまま引き継ぐ
+        widgets['extra'] = {k: v for k, v in dir_info.items() if k not in ('path', 'format', 'concurrent_fragments', 'http_chunk_size', 'buffer_size')}
+
+        # フラグメント並列数・チャンクサイズ・バッファサイズ（空欄は全体の設定を使用）
+        for key, label in (('buffer_size', 'バッファ'), ('http_chunk_size', 'チャンク'), ('concurrent_fragments', '分割')):
+            widgets[f'{key}_var'] = tk.StringVar(value=str(dir_info.get(key, '')))
+            ttk.Entry(row_frame, textvariable=widgets[f'{key}_var'], width=5).pack(side='right', padx=(2, 0))
+            ttk.Label(row_frame, text=f'{label}:').pack(side='right', padx=(5, 0))
+
         # パス選択ボタン
         widgets['select_btn'] = ttk.Button(row_frame, text='選択', command=lambda idx=index: self.change_dir(idx))
         widgets['select_btn'].pack(side='right', padx=(5, 0))
@@ -474,6 +569,16 @@ class ConfigGUI(tk.Tk):
         
         self.dir_widgets.append(widgets)
 
+    def _collect_directory(self, widgets):
+        """
+        ディレクトリリストの1行からディレクトリ情報を作成する（空欄の項目は含めない）。
+        """
+        directory = {"path": widgets['path_var'].get().strip(), "format": widgets['format_var'].get(), **widgets['extra']}
+        for key in ('concurrent_fragments', 'http_chunk_size', 'buffer_size'):
+            if value := widgets[f'{key}_var'].get().strip():
+                directory[key] = int(value) if key == 'concurrent_fragments' and value.isdigit() else value
+        return directory
+
     def add_directory(self):
         """
         新しいディレクトリ候補を追加する。
@@ -586,21 +691,46 @@ class ConfigGUI(tk.Tk):
         現在のGUIの状態を設定データに反映し、ファイルに保存する。
         """
         # パスが空でないディレクトリ情報のみを収集
-        directories = [d for w in self.dir_widgets if (d := {"path": w['path_var'].get().strip(), "format": w['format_var'].get()})['path']]
+        directories = [d for w in self.dir_widgets if (d := self._collect_directory(w))['path']]
         if not directories:
             messagebox.showwarning('警告', '最低1つのディレクトリを設定してください。')
             return False
-        
+
+        # 数値の入力欄が空欄や数値以外の場合、Tkinter変数の読み込みでTclErrorになるため先に確認
+        values = {}
+        for key, var in self.settings_map.items():
+            try:
+                values[key] = var.get()
+            except tk.TclError:
+                messagebox.showwarning('警告', f'{key} には数値を入力してください。')
+                return False
+
+        # フラグメント並列数とサイズの書式を確認
+        if any(not isinstance(d.get('concurrent_fragments', 0), int) for d in directories):
+            messagebox.showwarning('警告', 'フラグメント並列数は整数で指定してください。')
+            return False
+        size_pattern = re.compile(r'^(\d+(\.\d+)?[KkMmGg]?)?$')
+        sizes = [self.http_chunk_size_var.get().strip(), self.buffer_size_var.get().strip(), self.max_rate_var.get().strip()]
+        sizes += [d.get(key, '') for d in directories for key in ('http_chunk_size', 'buffer_size')]
+        if not all(size_pattern.match(size) for size in sizes):
+            messagebox.showwarning('警告', 'チャンクサイズ・バッファサイズ・帯域の上限は "10M" や "16K" のように指定してください。')
+            return False
+
         # ログ機能が有効なのにパスが空の場合に警告
         if self.enable_logging_var.get() and not self.log_path_var.get().strip():
             if not messagebox.askyesno('確認', 'ログ機能が有効ですが、ログファイルパスが設定されていません。\nこのまま保存しますか？'):
                 return False
         
+        # 並列数の最小値が最大値を超えていないか確認
+        if values['min_workers'] > values['max_workers']:
+            messagebox.showwarning('警告', '並列ダウンロード数の最小値が最大値を超えています。')
+            return False
+
         # 設定データを更新
         self.config_data['directories'] = directories
         self.config_data['default_directory_index'] = min(self.dir_var.get(), len(directories) - 1)
         for key, var in self.settings_map.items():
-            value = var.get()
+            value = values[key]
             if isinstance(var, tk.DoubleVar): value = round(value, 2) # DoubleVarは丸める
             self.config_data[key] = value
         
@@ -1,21 +1,28 @@
 import os
+import errno
+import hmac
 import json
+import heapq
 import re
 import sys
+import queue
+import random
 import shutil
-import pyperclip
-import requests
+import sqlite3
+import threading
+import time
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from yt_dlp import YoutubeDL
+import urllib.error
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# yt-dlp、Googleのクライアントライブラリ、requests、pyperclipは読み込みに時間がかかるため、
+# --show-configやローカル保存のみの実行で読み込まないよう、使用する関数の中でインポートします
+from encoding_presets import ENCODING_PRESETS, preset_args
 
 
 class Config:
@@ -62,6 +69,10 @@ class Config:
             self.data["destination"] = args.dest_type
             print(f"設定変更: destination -> {args.dest_type}")
             updated = True
+        if args.workers and self.data.get("workers") != args.workers:
+            self.data["workers"] = args.workers
+            print(f"設定変更: workers -> {args.workers}")
+            updated = True
         if args.no_notion and self.data.get("enable_notion_upload") is not False:
             self.data["enable_notion_upload"] = False
             print("設定変更: enable_notion_upload -> False")
@@ -129,9 +140,12 @@ class Config:
 class NotionUploader:
     """Notionデータベースへのログエントリのアップロードを処理するクラス"""
 
-    def __init__(self, config, error_logger):
+    API_URL = "https://api.notion.com/v1/pages"
+
+    def __init__(self, config, error_logger, metrics=None):
         self.config = config
         self.error_logger = error_logger
+        self.metrics = metrics or StageMetrics(config)
         self.enabled = self.config.get("enable_notion_upload", False)
         self.api_key = self.config.get("notion_api_key")
         self.database_id = self.config.get("notion_database_id")
@@ -153,6 +167,8 @@ class NotionUploader:
             self.error_logger.log(log_entry.get("URL"), error_msg)
             return None
 
+        import requests
+
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -166,10 +182,9 @@ class NotionUploader:
         }
 
         try:
-            response = requests.post(
-                "https://api.notion.com/v1/pages", headers=headers, json=payload
-            )
-            response.raise_for_status()
+            with self.metrics.measure("notion", log_entry.get("URL")):
+                response = requests.post(self.API_URL, headers=headers, json=payload)
+                response.raise_for_status()
             page_id = response.json().get("id")
             print(f"ログをNotionにアップロードしました。 Page ID: {page_id}")
             return page_id
@@ -212,111 +227,683 @@ class NotionUploader:
         return properties
 
 class ErrorLogger:
-    """エラー情報をローカルのJSONファイルに記録するクラス"""
+    """エラー情報をローカルのSQLiteデータベースに追記していくクラス
+
+    エラーは1件ずつ行として追加し、URLごとの未解決のエラーは部分インデックスで一意にする。
+    以前のJSONファイル（log.json）は初回の起動時にデータベースへ移行する。
+    """
+
+    # 古い解決済みのエラーを削除する間隔（秒）
+    COMPACT_INTERVAL = 24 * 3600
 
     def __init__(self, config):
         self.config = config
         self.enabled = self.config.get("enable_logging", True)
         self.log_file_path = self.config.get("log_file_path")
         self.jst = timezone(timedelta(hours=9), "JST")
-
-    def log(self, url, error_message):
-        """エラー情報を記録する"""
+        self.retention_days = int(self.config.get("log_retention_days", 90))
+        self.db_path = None
+        self._lock = threading.Lock()
+        self._conn = None
         if not self.enabled or not self.log_file_path:
             return
 
-        new_log_entry = {
-            "タイムスタンプ": datetime.now(self.jst).isoformat(),
-            "URL": url,
-            "エラーメッセージ": error_message,
-            "解決済み": False,
-        }
+        self.db_path = self.config.get("log_db_path") or (
+            os.path.splitext(self.log_file_path)[0] + ".db"
+        )
+        try:
+            self._open()
+            # 移行した古いエラーがすぐに削除されないよう、移行した回は整理を行いません
+            if not self._migrate_json():
+                self._compact()
+        except sqlite3.Error as e:
+            print(f"エラーログのデータベースを開けませんでした: {e}")
+            self._conn = None
+
+    def _open(self):
+        """データベースを開き、テーブルとインデックスを作成する"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        # 複数のワーカースレッドから利用するため、接続はロックで保護します
+        # 常駐プロセスなど別プロセスとの競合は、SQLiteのファイルロックで待ち合わせます
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS errors (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    url TEXT,
+                    message TEXT,
+                    attempts INTEGER,
+                    resolved INTEGER NOT NULL DEFAULT 0,
+                    resolved_at TEXT
+                )
+                """
+            )
+            # 同じURLの未解決のエラーは1件だけ記録します
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS errors_unresolved ON errors (url) WHERE resolved = 0"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS errors_url ON errors (url)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
 
-        logs = self._read_logs()
-        if any(log.get("URL") == url and not log.get("解決済み") for log in logs):
-            print(f"未解決の既存エラーログがあるため、新規ログは追加しません: {url}")
+    def _migrate_json(self):
+        """以前のJSON形式のログファイルがあれば、一度だけデータベースに取り込む（取り込んだ場合はTrue）"""
+        if not self.log_file_path.endswith(".json") or not os.path.exists(
+            self.log_file_path
+        ):
+            return False
+        try:
+            with open(self.log_file_path, "r", encoding="utf-8") as f:
+                logs = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"以前のエラーログを読み込めないため、移行しません: {e}")
+            return False
+        if not isinstance(logs, list):
+            logs = []
+
+        with self._lock:
+            # 別プロセスと同時に移行しないよう、書き込みロックを取得してから確認します
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                migrated = self._conn.execute(
+                    "SELECT 1 FROM meta WHERE key = 'migrated_json'"
+                ).fetchone()
+                if not migrated:
+                    for log in logs:
+                        self._conn.execute(
+                            "INSERT OR IGNORE INTO errors (timestamp, url, message, attempts, resolved) VALUES (?, ?, ?, ?, ?)",
+                            (
+                                log.get("タイムスタンプ") or datetime.now(self.jst).isoformat(),
+                                log.get("URL"),
+                                log.get("エラーメッセージ"),
+                                log.get("試行回数"),
+                                1 if log.get("解決済み") else 0,
+                            ),
+                        )
+                    self._conn.execute(
+                        "INSERT INTO meta VALUES ('migrated_json', ?)",
+                        (self.log_file_path,),
+                    )
+                self._conn.commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+                raise
+
+        # 移行済みのファイルは、誤って参照されないよう名前を変更して残します
+        try:
+            os.replace(self.log_file_path, self.log_file_path + ".migrated")
+        except OSError:
+            pass
+        if migrated:
+            return False
+        print(f"以前のエラーログ{len(logs)}件を移行しました: {self.db_path}")
+        return True
+
+    def _compact(self):
+        """保存期間を過ぎた解決済みのエラーを削除し、データベースを縮小する（1日に1回まで）"""
+        if self.retention_days <= 0:
+            return
+        now = time.time()
+        # 整理に失敗してもエラーログの記録は続けられるよう、接続は閉じずに警告だけ表示します
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT value FROM meta WHERE key = 'compacted_at'"
+                ).fetchone()
+                if row and now - float(row[0]) < self.COMPACT_INTERVAL:
+                    return
+                cutoff = datetime.now(self.jst) - timedelta(days=self.retention_days)
+                deleted = self._conn.execute(
+                    "DELETE FROM errors WHERE resolved = 1 AND timestamp < ?",
+                    (cutoff.isoformat(),),
+                ).rowcount
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('compacted_at', ?)", (str(now),)
+                )
+        except sqlite3.Error as e:
+            print(f"警告: エラーログの整理に失敗しました: {e}")
+            return
+        if not deleted:
+            return
+        print(f"保存期間を過ぎた解決済みのエラーログを{deleted}件削除しました。")
+        try:
+            with self._lock:
+                self._conn.execute("VACUUM")
+        except sqlite3.Error as e:
+            # 他のプロセスが使用中の場合は縮小を見送ります（削除済みの行は記録に影響しません）
+            print(f"警告: エラーログの縮小をスキップしました: {e}")
+
+    def log(self, url, error_message, attempts=None):
+        """エラー情報を記録する（attemptsはダウンロードの試行回数）"""
+        if not self._conn:
+            return
+
+        try:
+            with self._lock, self._conn:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO errors (timestamp, url, message, attempts) VALUES (?, ?, ?, ?)",
+                    (datetime.now(self.jst).isoformat(), url, error_message, attempts),
+                ).rowcount
+        except sqlite3.Error as e:
+            print(f"エラーログの書き込み/更新に失敗しました: {e}")
             return
 
-        logs.append(new_log_entry)
-        self._write_logs(logs)
-        print(f"エラーログを書き込みました: {url}")
+        if inserted:
+            print(f"エラーログを書き込みました: {url}")
+        else:
+            print(f"未解決の既存エラーログがあるため、新規ログは追加しません: {url}")
 
     def mark_as_resolved(self, url):
         """指定されたURLのエラーログを「解決済み」に更新する"""
-        if (
-            not self.enabled
-            or not self.log_file_path
-            or not os.path.exists(self.log_file_path)
-        ):
+        if not self._conn:
             return
 
-        logs = self._read_logs()
-        updated = False
-        for log in logs:
-            if log.get("URL") == url and not log.get("解決済み"):
-                log["解決済み"] = True
-                updated = True
+        try:
+            with self._lock, self._conn:
+                updated = self._conn.execute(
+                    "UPDATE errors SET resolved = 1, resolved_at = ? WHERE url = ? AND resolved = 0",
+                    (datetime.now(self.jst).isoformat(), url),
+                ).rowcount
+        except sqlite3.Error as e:
+            print(f"エラーログの書き込み/更新に失敗しました: {e}")
+            return
 
         if updated:
-            self._write_logs(logs)
             print(f"エラーログを「解決済み」に更新しました: {url}")
 
-    def _read_logs(self):
-        """ログファイルを読み込む"""
-        if not os.path.exists(self.log_file_path):
-            return []
-        try:
-            with open(self.log_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
 
-        if isinstance(data, list):
-            return data
+class DownloadArchive:
+    """ダウンロード済みの動画をローカルのSQLiteデータベースに記録するクラス"""
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+        # 複数のワーカースレッドから利用するため、接続はロックで保護します
+        self._conn = sqlite3.connect(archive_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS downloads (
+                    extractor TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    profile INTEGER,
+                    url TEXT,
+                    title TEXT,
+                    final_path TEXT,
+                    drive_id TEXT,
+                    size INTEGER,
+                    downloaded_at TEXT,
+                    PRIMARY KEY (extractor, video_id, format)
+                )
+                """
+            )
+            # --syncで再生リストごとに処理済みの動画を記録します
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    playlist TEXT NOT NULL,
+                    extractor TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    synced_at TEXT,
+                    PRIMARY KEY (playlist, extractor, video_id)
+                )
+                """
+            )
+
+    @staticmethod
+    def make_key(url, entry=None):
+        """再生リストのエントリまたはURLから(extractor, video_id)のキーを作成する"""
+        if entry:
+            extractor = entry.get("ie_key") or entry.get("extractor_key")
+            if extractor and entry.get("id"):
+                return extractor, entry["id"]
+        from yt_dlp.extractor import gen_extractor_classes
+
+        # 抽出を行わずに、URLにマッチするエクストラクタからIDを取得します
+        for ie in gen_extractor_classes():
+            if ie.suitable(url):
+                if video_id := ie.get_temp_id(url):
+                    return ie.ie_key(), video_id
+                break
+        return None
+
+    @staticmethod
+    def make_playlist_key(info):
+        """再生リストの情報から同期状態のキーを作成する（IDが不明な場合はURL）"""
+        if info.get("extractor_key") and info.get("id"):
+            return f"{info['extractor_key']}:{info['id']}"
+        return info.get("original_url")
+
+    def contains(self, key, format_choice):
+        """指定されたキーとフォーマットがダウンロード済みかどうかを返す"""
+        if not key:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM downloads WHERE extractor = ? AND video_id = ? AND format = ?",
+                (*key, format_choice),
+            ).fetchone()
+        return row is not None
+
+    def is_synced(self, playlist_key, key):
+        """再生リストの同期で処理済みの動画かどうかを返す"""
+        if not key:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sync_state WHERE playlist = ? AND extractor = ? AND video_id = ?",
+                (playlist_key, *key),
+            ).fetchone()
+        return row is not None
+
+    def mark_synced(self, playlist_key, keys):
+        """再生リストの同期で処理済みの動画を記録する"""
+        synced_at = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                [(playlist_key, *key, synced_at) for key in keys if key],
+            )
+
+    def add(self, key, format_choice, **record):
+        """ダウンロード成功を記録する"""
+        if not key:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO downloads (
+                    extractor, video_id, format, profile, url, title,
+                    final_path, drive_id, size, downloaded_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    *key,
+                    format_choice,
+                    record.get("profile"),
+                    record.get("url"),
+                    record.get("title"),
+                    record.get("final_path"),
+                    record.get("drive_id"),
+                    record.get("size"),
+                    record.get("downloaded_at"),
+                ),
+            )
+
+
+class MetadataCache:
+    """yt-dlpの抽出結果をTTLとサイズ上限付きでローカルに保存するキャッシュクラス"""
+
+    # 署名付きストリームURLに含まれる有効期限（UNIX時刻）
+    EXPIRE_PATTERN = re.compile(r"[?&/]expire[=/](\d+)")
+    # ストリームURLの有効期限に対して確保する余裕（秒）
+    EXPIRY_MARGIN = 300
+
+    def __init__(self, config, cache_path):
+        self.cache_path = cache_path
+        self.playlist_ttl = int(config.get("metadata_cache_playlist_ttl", 3600))
+        self.video_ttl = int(config.get("metadata_cache_video_ttl", 21600))
+        self.max_bytes = int(config.get("metadata_cache_max_mb", 64)) * 1024 * 1024
+        # --refresh-metadata指定時は読み込みを行わず、取得し直した結果で上書きします
+        self.refresh = config.get("refresh_metadata", False)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+
+    def get(self, key):
+        """キャッシュされた情報を取得する。期限切れまたは未登録の場合はNoneを返す"""
+        if self.refresh:
+            return None
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM metadata WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE metadata SET last_access = ? WHERE key = ?", (now, key)
+            )
+        print(f"キャッシュ済みのメタデータを使用します: {key}")
+        return json.loads(row[0])
+
+    def put(self, key, info):
+        """抽出結果をキャッシュに保存する"""
+        now = time.time()
+        ttl = self.playlist_ttl if info.get("entries") else self.video_ttl
+        expires_at = now + ttl
+        # 署名付きURLは有効期限を過ぎてキャッシュしないようにします
+        if (stream_expiry := self._stream_expiry(info)) is not None:
+            expires_at = min(expires_at, stream_expiry - self.EXPIRY_MARGIN)
+        if expires_at <= now:
+            return
+
+        from yt_dlp import YoutubeDL
+
+        # 関数などのJSON化できない内部キーは除外します
+        sanitized = {
+            k: v
+            for k, v in YoutubeDL.sanitize_info(info).items()
+            if not k.startswith("__")
+        }
+        data = json.dumps(sanitized, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), expires_at, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        """期限切れのエントリを削除し、サイズ上限を超えた分を古い順(LRU)に削除する"""
+        self._conn.execute("DELETE FROM metadata WHERE expires_at <= ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM metadata ORDER BY last_access"
+        ).fetchall():
+            self._conn.execute("DELETE FROM metadata WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _stream_expiry(self, info):
+        """情報辞書に含まれるストリームURLの最も早い有効期限を返す"""
+        formats = (info.get("formats") or []) + (info.get("requested_formats") or [])
+        expiries = [
+            int(match.group(1))
+            for fmt in formats + [info]
+            for url_key in ("url", "manifest_url", "fragment_base_url")
+            if isinstance(fmt.get(url_key), str)
+            and (match := self.EXPIRE_PATTERN.search(fmt[url_key]))
+        ]
+        return min(expiries) if expiries else None
+
+
+class JobManifest:
+    """再生リストのジョブの進行状況を追記専用のジャーナルに記録し、再開を可能にするクラス"""
+
+    # 各動画の状態遷移: enumerated → downloaded → post-processed → sorted → logged
+    RESUMABLE_STATES = ("post-processed", "sorted", "logged")
+    # 再開時に復元する動画情報のキー
+    INFO_KEYS = ("id", "extractor_key", "title", "duration", "webpage_url")
 
+    def __init__(self, jobs_dir, job_id=None, url=None, overrides=None):
+        self.job_id = job_id or (
+            f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        )
+        self.path = os.path.join(jobs_dir, f"{self.job_id}.jsonl")
+        self.url = url
+        self.overrides = overrides or {}
+        self.job = {}
+        self.entries = {}
+        self._lock = threading.Lock()
+        if job_id:
+            self._replay()
+
+    def _replay(self):
+        """ジャーナルを先頭から読み込み、最新の状態を復元する"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 書き込み途中で中断された行は無視します
+                    continue
+                self._apply(record)
+        self.url = self.job.get("url", self.url)
+        self.overrides = self.job.get("overrides", self.overrides)
+
+    def _apply(self, record):
+        """ジャーナルの1レコードをメモリ上の状態に反映する"""
+        record = dict(record)
+        record_type = record.pop("type")
+        if record_type == "job":
+            self.job.update(record)
+            for url in record.get("entries", []):
+                self.entries.setdefault(url, {"state": "enumerated"})
+        elif record_type == "entries":
+            # 再生リストの列挙はページ単位で追記されます
+            for url in record["urls"]:
+                self.entries.setdefault(url, {"state": "enumerated"})
+        else:
+            self.entries.setdefault(record.pop("url"), {}).update(record)
+
+    def _append(self, record):
+        """レコードを1行としてジャーナルに追記し、ディスクに同期する"""
+        with self._lock:
+            self._apply(record)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def update_job(self, **fields):
+        """ジョブ全体の情報を更新する"""
+        self._append({"type": "job", **fields})
+
+    def update_entry(self, url, **fields):
+        """動画1件の状態を更新する"""
+        self._append({"type": "entry", "url": url, **fields})
+
+    def tracks(self, url):
+        """このジョブで列挙された動画かどうかを返す"""
+        return url in self.entries
+
+    def state(self, url):
+        """動画の現在の状態を返す"""
+        return self.entries.get(url, {}).get("state")
+
+    def start(self, playlist_info):
+        """再生リストのジョブをジャーナルに記録する（再開時は何もしない）"""
+        if self.job.get("playlist_info"):
+            print(f"ジョブ {self.job_id} を再開します。")
+            return
+        self.update_job(
+            url=self.url,
+            overrides=self.overrides,
+            playlist_info={
+                "title": playlist_info.get("title", "playlist"),
+                "original_url": playlist_info.get("original_url", self.url),
+                "id": playlist_info.get("id"),
+                "extractor_key": playlist_info.get("extractor_key"),
+            },
+            created_at=datetime.now().isoformat(),
+        )
         print(
-            "警告: ログファイルが予期しない形式（リストではない）です。ログを初期化します。"
+            f"ジョブID: {self.job_id}（中断した場合は --resume {self.job_id} で再開できます）"
         )
-        return []
 
-    def _write_logs(self, logs):
-        """ログファイルに書き込む"""
-        try:
-            with open(self.log_file_path, "w", encoding="utf-8") as f:
-                json.dump(logs, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"エラーログの書き込み/更新に失敗しました: {e}")
+    def add_entries(self, urls):
+        """列挙した動画のURLをまとめてジャーナルに記録する（記録済みのURLは除く）"""
+        if urls := [url for url in urls if url not in self.entries]:
+            self._append({"type": "entries", "urls": urls})
+
+    def finish_enumeration(self):
+        """再生リストのすべてのエントリを列挙し終えたことを記録する"""
+        if not self.job.get("enumerated"):
+            self.update_job(enumerated=True)
+
+    def playlist_info(self):
+        """列挙を終えた再生リストの情報を、列挙結果の形式で返す（途中の場合はNone）"""
+        # 以前の形式のジャーナルはエントリを一括で記録しています
+        if not (self.job.get("enumerated") or self.job.get("entries")):
+            return None
+        return {
+            **self.job["playlist_info"],
+            "entries": [{"url": url} for url in self.entries],
+        }
+
+    def record_result(self, result):
+        """ダウンロードと後処理が完了した結果を記録する"""
+        info = result.get("info") or {}
+        self.update_entry(
+            result["url"],
+            state="post-processed",
+            result={
+                "success": result["success"],
+                "error_message": result["error_message"],
+                "filepath": result["filepath"],
+                "output_name": result.get("output_name"),
+                "artifacts": result.get("artifacts", []),
+                "format": result["format"],
+                "conversion": result.get("conversion"),
+                "outputs": result.get("outputs"),
+                "attempts": result.get("attempts", 1),
+                "info": {k: info.get(k) for k in self.INFO_KEYS if k in info},
+            },
+        )
+
+    def resumable_results(self):
+        """ダウンロードをやり直さずに再開できる動画の結果を返す"""
+        results = []
+        for url, entry in self.entries.items():
+            state = entry.get("state")
+            if state not in self.RESUMABLE_STATES or "result" not in entry:
+                continue
+            result = entry["result"]
+            # 仕分け前のファイルが残っていない場合はダウンロードし直します
+            filepaths = [
+                o["filepath"] for o in result.get("outputs") or [result] if o["success"]
+            ]
+            if state == "post-processed" and not all(
+                os.path.exists(path or "") for path in filepaths
+            ):
+                continue
+            results.append({**result, "url": url, "job_state": state})
+        return results
 
 
 class FileSorter:
     """ダウンロード後のファイルの仕分け、アップロード、ログ記録を処理するクラス"""
 
     SCOPES = ["https://www.googleapis.com/auth/drive.file"]
-
-    def __init__(self, config, error_logger, notion_uploader):
+    # Drive APIクライアントはスレッドセーフではないため、呼び出しを直列化します
+    _gdrive_lock = threading.Lock()
+
+    # 帯域制限時のアップロードのチャンクサイズ（256KiBの倍数である必要があります）
+    GDRIVE_CHUNK_SIZE = 8 * 1024 * 1024
+
+    def __init__(
+        self,
+        config,
+        error_logger,
+        notion_uploader,
+        archive=None,
+        gdrive_service=None,
+        rate_limiter=None,
+        metrics=None,
+    ):
         self.config = config
         self.error_logger = error_logger
         self.notion_uploader = notion_uploader
+        self.archive = archive
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics or StageMetrics(config)
         self.destination = self.config.get("destination", "local")
         self.jst = timezone(timedelta(hours=9), "JST")
 
+        # 常駐モードでは認証済みのDriveサービスを使い回します
         self.gdrive_service = (
-            self._get_drive_service() if self.destination == "gdrive" else None
+            (gdrive_service or self._get_drive_service())
+            if self.destination == "gdrive"
+            else None
         )
 
-    def process_downloads(self, download_results):
-        """ダウンロード結果のリストを処理する"""
-        is_playlist = len(download_results) > 1
+        # ストリーミング仕分け用の状態（ワーカープールはすべてのURLで共有します）
+        self.sort_workers = max(1, int(self.config.get("sort_workers", 2)))
+        self._sort_executor = None
+        self._sort_slots = threading.BoundedSemaphore(self.sort_workers * 2)
+        self._playlist_streams = {}
+        self._single_futures = {}
+
+    def submit(self, result, manifest=None):
+        """ダウンロードが完了した動画を、仕分けステージに逐次投入する"""
+        if self._sort_executor is None:
+            print(f"仕分けステージを開始します（ワーカー数: {self.sort_workers}）")
+            self._sort_executor = ThreadPoolExecutor(max_workers=self.sort_workers)
+
+        # 仕分け待ちの件数を制限し、一時ディレクトリの使用量を抑えます
+        self._sort_slots.acquire()
+        if "playlist_info" not in result:
+            future = self._sort_executor.submit(self._process_single_file, result)
+            self._single_futures[result["url"]] = future
+        else:
+            key = result["playlist_info"]["original_url"]
+            if (stream := self._playlist_streams.get(key)) is None:
+                stream = self._start_playlist_stream(result, manifest)
+                self._playlist_streams[key] = stream
+            future = self._sort_executor.submit(
+                self._sort_playlist_entry, result, stream
+            )
+            stream["results"].append(result)
+            stream["futures"].append(future)
+        future.add_done_callback(lambda _: self._sort_slots.release())
+
+    def process_downloads(self, download_results, manifest=None):
+        """1つのURLのダウンロード結果のリストを処理し、仕分けを完了させる"""
+        if not download_results:
+            return
+
+        first = download_results[0]
+        if "playlist_info" not in first:
+            if future := self._single_futures.pop(first["url"], None):
+                future.result()
+            else:
+                self._process_single_file(first)
+            return
 
-        if is_playlist:
-            self._process_playlist(download_results)
-        elif download_results:
-            self._process_single_file(download_results[0])
+        key = first["playlist_info"]["original_url"]
+        if key not in self._playlist_streams:
+            # 逐次投入されていない再生リストはここでまとめて投入します
+            for result in download_results:
+                self.submit(result, manifest)
+        self._finish_playlist_stream(self._playlist_streams.pop(key))
+
+    def close(self):
+        """仕分け用のワーカープールを終了する"""
+        if self._sort_executor is not None:
+            self._sort_executor.shutdown(wait=True)
+            self._sort_executor = None
 
     def _process_single_file(self, result):
         """単一のダウンロード結果を処理する"""
+        # 複数形式を指定した場合は、出力ごとに仕分けてNotionに1行ずつ登録します
+        for output in self._split_outputs(result):
+            self._sort_single_output(output)
+        self._cleanup_artifacts(result)
+
+    def _sort_single_output(self, result):
+        """単一の出力ファイルを仕分けし、ログを記録する"""
         if not result["success"]:
-            self.error_logger.log(result["url"], result["error_message"])
+            self.error_logger.log(
+                result["url"], result["error_message"], result.get("attempts")
+            )
             intended_path, _ = self._get_final_destination(result)
             log_entry = self._create_log_entry(result, intended_path)
             if self.notion_uploader:
@@ -326,9 +913,13 @@ class FileSorter:
         final_path, gdrive_folder_id = self._get_final_destination(result)
 
         try:
-            final_path = self._sort_file(
-                result["filepath"], final_path, gdrive_folder_id
+            size = (
+                os.path.getsize(result["filepath"])
+                if os.path.exists(result["filepath"])
+                else None
             )
+            final_path = self._sort_file(result, final_path, gdrive_folder_id)
+            self._record_archive(result, final_path, size)
             self.error_logger.mark_as_resolved(result["url"])
             log_entry = self._create_log_entry(result, final_path)
             if self.notion_uploader:
@@ -342,85 +933,149 @@ class FileSorter:
             if self.notion_uploader:
                 self.notion_uploader.upload(log_entry)
 
-    def _process_playlist(self, results):
-        """再生リストのダウンロード結果を処理する"""
-        playlist_info = results[0]["playlist_info"]
-        playlist_url = playlist_info["original_url"]
+    @staticmethod
+    def _split_outputs(result):
+        """ダウンロード結果を、出力ファイルごとの結果のリストに分割する"""
+        if not result.get("outputs"):
+            return [result]
+        return [
+            {**result, **output, "fanout": len(result["outputs"]) > 1}
+            for output in result["outputs"]
+        ]
+
+    def _start_playlist_stream(self, first_result, manifest=None):
+        """再生リストの保存先を準備し、仕分け用のワーカープールを起動する"""
+        playlist_info = first_result["playlist_info"]
         playlist_title = playlist_info.get("title", "再生リスト")
+        formats = split_formats(first_result["format"])
+
+        if manifest and "final_dir" in manifest.job:
+            # 再開時は前回決定した保存先をそのまま使います
+            final_dirs = manifest.job.get("final_dirs") or dict.fromkeys(
+                formats, manifest.job["final_dir"]
+            )
+            gdrive_folder_id = manifest.job["gdrive_folder_id"]
+        else:
+            # 形式ごとに、その形式のプロファイルの保存先に再生リストのディレクトリを作成します
+            final_dirs = {}
+            for fmt in formats:
+                final_dirs[fmt], gdrive_folder_id = self._get_final_destination(
+                    {"format": fmt, "fanout": len(formats) > 1}, is_playlist=True
+                )
+                if self.destination == "local" and self.config.get(
+                    "create_playlist_folder", True
+                ):
+                    final_dirs[fmt] = self._create_local_playlist_directory(
+                        final_dirs[fmt], playlist_title
+                    )
+
+            if self.destination == "gdrive" and self.config.get(
+                "create_playlist_folder", True
+            ):
+                gdrive_folder_id = self._find_or_create_gdrive_folder(
+                    playlist_title, self.config.get("google_drive_parent_folder_id")
+                )
+
+            if manifest:
+                manifest.update_job(
+                    final_dir=final_dirs[formats[0]],
+                    final_dirs=final_dirs,
+                    gdrive_folder_id=gdrive_folder_id,
+                )
+
+        return {
+            "playlist_info": playlist_info,
+            "final_dir": final_dirs[formats[0]],
+            "final_dirs": final_dirs,
+            "gdrive_folder_id": gdrive_folder_id,
+            "manifest": manifest,
+            "results": [],
+            "futures": [],
+        }
+
+    def _sort_playlist_entry(self, result, stream):
+        """再生リストの1件を仕分けし、(出力ごとのログエントリ, 成否, エラーメッセージ)を返す"""
+        manifest = stream["manifest"]
+        if result.get("job_state") in ("sorted", "logged"):
+            # 前回の実行で仕分け済みの動画は記録された結果を使います
+            entry = manifest.entries[result["url"]]
+            # 以前の形式のジャーナルはログを1件だけ記録しています
+            logs = entry.get("logs") or [entry["log"]]
+            return logs, entry["sorted_success"], entry["sorted_error"]
+
+        logs = []
+        error_messages = []
+        for output in self._split_outputs(result):
+            log, success, error_message = self._sort_entry_file(output, stream)
+            logs.append(log)
+            if not success:
+                error_messages.append(error_message)
+        self._cleanup_artifacts(result)
+        success, error_message = not error_messages, "; ".join(error_messages) or None
+        if manifest:
+            manifest.update_entry(
+                result["url"],
+                state="sorted",
+                logs=logs,
+                sorted_success=success,
+                sorted_error=error_message,
+            )
+        return logs, success, error_message
 
-        final_playlist_dir, gdrive_folder_id = self._get_final_destination(
-            results[0], is_playlist=True
+    def _sort_entry_file(self, result, stream):
+        """再生リストの1件のファイルを移動またはアップロードする"""
+        final_playlist_dir = stream["final_dirs"].get(
+            result["format"], stream["final_dir"]
         )
+        if not result["success"]:
+            self.error_logger.log(
+                result["url"], result["error_message"], result.get("attempts")
+            )
+            log = self._create_log_entry(result, final_playlist_dir)
+            return log, False, result["error_message"]
 
-        if self.destination == "gdrive" and self.config.get(
-            "create_playlist_folder", True
-        ):
-            gdrive_folder_id = self._find_or_create_gdrive_folder(
-                playlist_title, self.config.get("google_drive_parent_folder_id")
+        try:
+            size = (
+                os.path.getsize(result["filepath"])
+                if os.path.exists(result["filepath"])
+                else None
             )
-        elif self.destination == "local" and self.config.get(
-            "create_playlist_folder", True
-        ):
-            final_playlist_dir = self._create_local_playlist_directory(
-                final_playlist_dir, playlist_title
+            final_video_path = self._sort_file(
+                result, final_playlist_dir, stream["gdrive_folder_id"]
             )
+            self._record_archive(result, final_video_path, size)
+            self.error_logger.mark_as_resolved(result["url"])
+            return self._create_log_entry(result, final_video_path), True, None
+        except Exception as e:
+            print(f"ファイルの仕分け中にエラーが発生しました: {e}")
+            self.error_logger.log(result["url"], str(e))
+            log = self._create_log_entry(
+                result, final_playlist_dir, success=False, error_msg=str(e)
+            )
+            return log, False, str(e)
+
+    def _finish_playlist_stream(self, stream):
+        """仕分けの完了を待ち、再生リスト全体のログとNotionへの登録を確定する"""
+        wait(stream["futures"])
+        manifest = stream["manifest"]
+
+        results = stream["results"]
+        playlist_info = stream["playlist_info"]
+        playlist_url = playlist_info["original_url"]
+        playlist_title = playlist_info.get("title", "再生リスト")
+        final_playlist_dir = stream["final_dir"]
 
         video_logs = []
         success_count = 0
-        total_duration = 0
         error_messages = []
-
-        for result in results:
-            total_duration += result["info"].get("duration", 0)
-            if not result["success"]:
-                self.error_logger.log(result["url"], result["error_message"])
-                log = self._create_log_entry(result, final_playlist_dir)
-                video_logs.append(log)
-                if result["error_message"]:
-                    error_messages.append(result["error_message"])
-                continue
-
-            try:
-                final_video_path = self._sort_file(
-                    result["filepath"], final_playlist_dir, gdrive_folder_id
-                )
-                self.error_logger.mark_as_resolved(result["url"])
-                log = self._create_log_entry(result, final_video_path)
-                video_logs.append(log)
+        for result, future in zip(results, stream["futures"]):
+            logs, success, error_message = future.result()
+            video_logs.append((result["url"], logs))
+            if success:
                 success_count += 1
-            except Exception as e:
-                print(f"ファイルの仕分け中にエラーが発生しました: {e}")
-                self.error_logger.log(result["url"], str(e))
-                log = self._create_log_entry(
-                    result, final_playlist_dir, success=False, error_msg=str(e)
-                )
-                video_logs.append(log)
-                error_messages.append(str(e))
-
-        # 一時プレイリストディレクトリをクリーンアップします。動画のサブディレクトリは_sort_fileでクリーンアップされているはずです。
-        try:
-            if results and results[0].get("filepath"):
-                # .../temp_downloads/PlaylistTitle/VideoTitle/file.mp4 のようなパスから PlaylistTitle ディレクトリを取得します
-                video_dir = os.path.dirname(results[0]["filepath"])
-                playlist_temp_dir = os.path.dirname(video_dir)
-
-                # temp_downloads 内のディレクトリを削除していることを確認するための安全チェック
-                if (
-                    os.path.exists(playlist_temp_dir)
-                    and "temp_downloads" in playlist_temp_dir
-                ):
-                    playlist_title_from_info = results[0]["playlist_info"].get(
-                        "title", "playlist"
-                    )
-                    safe_title = re.sub(r'[\/*?:"<>|]', "_", playlist_title_from_info)
-                    if os.path.basename(playlist_temp_dir) == safe_title:
-                        print(
-                            f"一時プレイリストディレクトリをクリーンアップします: {playlist_temp_dir}"
-                        )
-                        shutil.rmtree(playlist_temp_dir)
-                        print(f"クリーンアップ完了: {playlist_temp_dir}")
-        except Exception as e:
-            print(f"一時プレイリストディレクトリのクリーンアップに失敗しました: {e}")
+            elif error_message:
+                error_messages.append(error_message)
+        total_duration = sum(r["info"].get("duration") or 0 for r in results)
 
         playlist_log = self._create_log_entry(
             {
@@ -438,11 +1093,62 @@ class FileSorter:
 
         if self.notion_uploader:
             print("\nNotionへのアップロードを開始します...")
-            parent_page_id = self.notion_uploader.upload(playlist_log)
+            # 再開時は前回作成した親アイテムを使い、重複して登録しないようにします
+            parent_page_id = manifest.job.get("parent_page_id") if manifest else None
+            if not parent_page_id:
+                parent_page_id = self.notion_uploader.upload(playlist_log)
+                if parent_page_id and manifest:
+                    manifest.update_job(parent_page_id=parent_page_id)
             if parent_page_id:
                 print("各動画のログをサブアイテムとして登録します。")
-                for v_log in video_logs:
-                    self.notion_uploader.upload(v_log, parent_page_id=parent_page_id)
+                for url, logs in video_logs:
+                    if manifest and manifest.state(url) == "logged":
+                        continue
+                    # 複数形式の場合は出力ごとに1行ずつ登録します
+                    uploaded = [
+                        self.notion_uploader.upload(v_log, parent_page_id=parent_page_id)
+                        for v_log in logs
+                    ]
+                    if all(uploaded):
+                        self._mark_logged(manifest, url)
+        else:
+            for url, _ in video_logs:
+                self._mark_logged(manifest, url)
+
+        if manifest and all(manifest.state(url) == "logged" for url, _ in video_logs):
+            manifest.update_job(completed=True)
+            print(f"ジョブ {manifest.job_id} が完了しました。")
+
+    def _mark_logged(self, manifest, url):
+        """ジョブのジャーナルで動画を記録済みにする"""
+        if manifest and manifest.state(url) != "logged":
+            manifest.update_entry(url, state="logged")
+
+    def _record_archive(self, result, final_path, size):
+        """仕分けが完了した動画をダウンロードアーカイブに記録する"""
+        if not self.archive or not final_path:
+            return
+        info = result.get("info", {})
+        drive_id = None
+        if self.destination == "gdrive":
+            drive_id = final_path.rsplit("/", 1)[-1]
+        self.archive.add(
+            DownloadArchive.make_key(result["url"], info),
+            result["format"],
+            profile=self.config.get("default_directory_index", 0),
+            url=result["url"],
+            title=info.get("title"),
+            final_path=final_path,
+            drive_id=drive_id,
+            size=size,
+            downloaded_at=datetime.now(self.jst).isoformat(),
+        )
+        # --syncでは、すべての形式を仕分け終えた動画だけを同期済みにします
+        # （移動やアップロードに失敗した動画は、次回の同期で再び処理されます）
+        if (sync := result.get("sync")) and all(
+            self.archive.contains(sync["key"], fmt) for fmt in sync["formats"]
+        ):
+            self.archive.mark_synced(sync["playlist"], [sync["key"]])
 
     def _get_final_destination(self, result, is_playlist=False):
         """設定に基づいて最終的な保存先パスまたはGdriveフォルダIDを取得する"""
@@ -474,6 +1180,16 @@ class FileSorter:
             default_index = 0
 
         default_dir_info = directories[default_index]
+        if result.get("fanout"):
+            # 複数形式の出力は、その形式を指定したプロファイルの保存先に仕分けます
+            default_dir_info = next(
+                (
+                    d
+                    for d in directories
+                    if split_formats(d.get("format")) == [result["format"]]
+                ),
+                default_dir_info,
+            )
         path = default_dir_info.get('path')
         
         if not os.path.isdir(path):
@@ -482,41 +1198,113 @@ class FileSorter:
 
         return path, None
 
-    def _sort_file(self, temp_filepath, final_dest, gdrive_folder_id):
-        """ファイルを最終目的地に移動またはアップロードし、一時ディレクトリをクリーンアップする"""
+    def _sort_file(self, result, final_dest, gdrive_folder_id):
+        """ファイルを最終目的地に移動またはアップロードする"""
+        temp_filepath = result["filepath"]
         if not os.path.exists(temp_filepath):
             return ""
 
+        # 一時ディレクトリでは動画IDのファイル名のため、保存先ではタイトルの名前にします
         filename = os.path.basename(temp_filepath)
+        if output_name := result.get("output_name"):
+            filename = output_name + os.path.splitext(temp_filepath)[1]
         final_path = ""
 
-        if self.destination == "gdrive":
-            print(f"{filename} をGoogle Driveにアップロードしています...")
-            upload_id = self._upload_to_gdrive(temp_filepath, gdrive_folder_id)
-            if upload_id:
-                print(f"ファイルID: {upload_id}。アップロードに成功しました。")
-                final_path = f"https://drive.google.com/file/d/{upload_id}"
-            else:
-                raise Exception("Google Driveへのアップロードに失敗しました。")
-        else:  # ローカル保存
-            final_path_str = os.path.join(final_dest, filename)
-            print(f"{filename} を {final_dest} に移動しています...")
-            shutil.move(temp_filepath, final_path_str)
-            print("移動に成功しました。")
-            final_path = Path(os.path.abspath(final_path_str)).as_uri()
-
-        # 動画用の一時ディレクトリをクリーンアップ
-        try:
-            video_temp_dir = os.path.dirname(temp_filepath)
-            if os.path.exists(video_temp_dir) and "temp_downloads" in video_temp_dir:
-                print(f"一時ディレクトリをクリーンアップします: {video_temp_dir}")
-                shutil.rmtree(video_temp_dir)
-                print(f"クリーンアップ完了: {video_temp_dir}")
-        except Exception as e:
-            print(f"一時ディレクトリのクリーンアップに失敗しました: {e}")
+        with self.metrics.measure(
+            "sort",
+            result["url"],
+            nbytes=os.path.getsize(temp_filepath),
+            format=result["format"],
+            method="upload" if self.destination == "gdrive" else "move",
+        ):
+            if self.destination == "gdrive":
+                print(f"{filename} をGoogle Driveにアップロードしています...")
+                upload_id = self._upload_to_gdrive(
+                    temp_filepath, gdrive_folder_id, filename
+                )
+                if upload_id:
+                    print(f"ファイルID: {upload_id}。アップロードに成功しました。")
+                    final_path = f"https://drive.google.com/file/d/{upload_id}"
+                else:
+                    raise Exception("Google Driveへのアップロードに失敗しました。")
+            else:  # ローカル保存
+                final_path_str = os.path.join(final_dest, filename)
+                print(f"{filename} を {final_dest} に移動しています...")
+                self._move_file(temp_filepath, final_path_str)
+                print("移動に成功しました。")
+                final_path = Path(os.path.abspath(final_path_str)).as_uri()
 
         return final_path
 
+    @staticmethod
+    def _cleanup_artifacts(result):
+        """ダウンロードで生成された一時ファイルを削除する（ディレクトリの走査は行わない）"""
+        for path in result.get("artifacts") or [result.get("filepath")]:
+            if not path:
+                continue
+            for candidate in (path, f"{path}.part", f"{path}.ytdl"):
+                try:
+                    os.remove(candidate)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"一時ファイルの削除に失敗しました: {candidate} ({e})")
+
+    @staticmethod
+    def _move_file(src, dst):
+        """ファイルを移動する（同じデバイスならリネーム、別デバイスならコピー後にアトミックに置き換える）"""
+        try:
+            os.replace(src, dst)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        # 書き込み途中のファイルが保存先に現れないよう、一時ファイルに書き出してから置き換えます
+        temp_dst = f"{dst}.part-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(src, "rb") as fsrc, open(temp_dst, "wb") as fdst:
+                FileSorter._copy_file_data(fsrc.fileno(), fdst.fileno())
+                os.fsync(fdst.fileno())
+            shutil.copystat(src, temp_dst)
+            os.replace(temp_dst, dst)
+        except BaseException:
+            if os.path.exists(temp_dst):
+                os.remove(temp_dst)
+            raise
+        os.remove(src)
+
+    @staticmethod
+    def _copy_file_data(src_fd, dst_fd):
+        """カーネル内コピー（copy_file_range/sendfile）でファイルの内容をコピーする"""
+        size = os.fstat(src_fd).st_size
+        offset = 0
+        if hasattr(os, "copy_file_range"):
+            try:
+                while offset < size:
+                    copied = os.copy_file_range(
+                        src_fd, dst_fd, size - offset, offset, offset
+                    )
+                    if copied == 0:
+                        break
+                    offset += copied
+            except OSError as e:
+                # ファイルシステムをまたぐコピーに対応していないカーネルではsendfileを使います
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+        if offset < size and sys.platform.startswith("linux"):
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            while offset < size:
+                sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        if offset < size:
+            os.lseek(src_fd, offset, os.SEEK_SET)
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            while chunk := os.read(src_fd, 1024 * 1024):
+                os.write(dst_fd, chunk)
+
     def _create_local_playlist_directory(self, base_dir, playlist_title):
         """ローカルに再生リスト用のディレクトリを作成する"""
         safe_title = re.sub(r'[\/*?:"<>|]', "_", playlist_title)
@@ -541,6 +1329,11 @@ class FileSorter:
         }
         quality_key = quality_map.get(result["format"])
         quality = self.config.get(quality_key, "best") if quality_key else "best"
+        conversion_labels = {
+            "none": "変換なし",
+            "remux": "リマックス",
+            "transcode": "再エンコード",
+        }
 
         return {
             "タイムスタンプ": datetime.now(self.jst).isoformat(),
@@ -552,10 +1345,18 @@ class FileSorter:
             "時間": info.get("duration"),
             "成否": is_successful,
             "エラーメッセージ": "" if is_successful else message,
+            "試行回数": result.get("attempts", 1),
+            "変換方法": conversion_labels.get(result.get("conversion"), ""),
         }
 
     # --- Google Drive Methods ---
     def _get_drive_service(self):
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+        from googleapiclient.errors import HttpError
+
         creds = None
         token_path = self.config.get("google_drive_token_path")
         credentials_path = self.config.get("google_drive_credentials_path")
@@ -607,20 +1408,39 @@ class FileSorter:
             )
             return None
 
-    def _upload_to_gdrive(self, file_path, folder_id):
+    def _upload_to_gdrive(self, file_path, folder_id, filename=None):
         if not self.gdrive_service or not os.path.exists(file_path):
             print("Google Driveサービスが利用できないか、ファイルが存在しません。")
             return None
+        from googleapiclient.errors import HttpError
+        from googleapiclient.http import MediaFileUpload
 
-        file_metadata = {"name": os.path.basename(file_path), "parents": [folder_id]}
-        media = MediaFileUpload(file_path, resumable=True)
+        file_metadata = {
+            "name": filename or os.path.basename(file_path),
+            "parents": [folder_id],
+        }
+        media = MediaFileUpload(
+            file_path, resumable=True, chunksize=self.GDRIVE_CHUNK_SIZE
+        )
 
         try:
-            file = (
-                self.gdrive_service.files()
-                .create(body=file_metadata, media_body=media, fields="id")
-                .execute()
-            )
+            with self._gdrive_lock:
+                request = self.gdrive_service.files().create(
+                    body=file_metadata, media_body=media, fields="id"
+                )
+            # チャンクごとに送信し、ダウンロードと共通の帯域制限を適用します
+            # （ロックはチャンクの送信中だけ保持し、帯域制限の待機中はフォルダの検索・作成を妨げません）
+            file = None
+            sent = 0
+            while file is None:
+                if self.rate_limiter:
+                    self.rate_limiter.consume(
+                        min(self.GDRIVE_CHUNK_SIZE, media.size() - sent)
+                    )
+                with self._gdrive_lock:
+                    status, file = request.next_chunk()
+                if status:
+                    sent = status.resumable_progress
             return file.get("id")
         except HttpError as error:
             print(f"アップロード中にエラーが発生しました: {error}")
@@ -630,31 +1450,35 @@ class FileSorter:
     def _find_or_create_gdrive_folder(self, folder_name, parent_folder_id):
         if not self.gdrive_service:
             return parent_folder_id
+        from googleapiclient.errors import HttpError
 
         try:
-            query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and '{parent_folder_id}' in parents and trashed=false"
-            response = (
-                self.gdrive_service.files()
-                .list(q=query, spaces="drive", fields="files(id, name)")
-                .execute()
-            )
-            if folders := response.get("files", []):
-                print(f"既存のGoogle Driveフォルダを見つけました: '{folder_name}'")
-                return folders[0].get("id")
-
-            print(f"Google Driveフォルダを作成しています: '{folder_name}'...")
-            file_metadata = {
-                "name": folder_name,
-                "mimeType": "application/vnd.google-apps.folder",
-                "parents": [parent_folder_id],
-            }
-            folder = (
-                self.gdrive_service.files()
-                .create(body=file_metadata, fields="id")
-                .execute()
-            )
-            print(f"フォルダを作成しました。ID: {folder.get('id')}")
-            return folder.get("id")
+            # 他のグループのアップロードと同時に呼ばれるため、検索と作成をまとめて直列化します
+            # （同じ名前のフォルダが重複して作成されることも防ぎます）
+            with self._gdrive_lock:
+                query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and '{parent_folder_id}' in parents and trashed=false"
+                response = (
+                    self.gdrive_service.files()
+                    .list(q=query, spaces="drive", fields="files(id, name)")
+                    .execute()
+                )
+                if folders := response.get("files", []):
+                    print(f"既存のGoogle Driveフォルダを見つけました: '{folder_name}'")
+                    return folders[0].get("id")
+
+                print(f"Google Driveフォルダを作成しています: '{folder_name}'...")
+                file_metadata = {
+                    "name": folder_name,
+                    "mimeType": "application/vnd.google-apps.folder",
+                    "parents": [parent_folder_id],
+                }
+                folder = (
+                    self.gdrive_service.files()
+                    .create(body=file_metadata, fields="id")
+                    .execute()
+                )
+                print(f"フォルダを作成しました。ID: {folder.get('id')}")
+                return folder.get("id")
         except HttpError as error:
             print(f"フォルダの検索または作成中にエラーが発生しました: {error}")
             self.error_logger.log(
@@ -663,30 +1487,607 @@ class FileSorter:
             return parent_folder_id
 
 
+class ConcurrencyController:
+    """スループットとスロットリングに応じて並列ダウンロード数を増減する(AIMD)クラス"""
+
+    # yt-dlpが報告するスロットリング・タイムアウトのエラーメッセージ
+    THROTTLE_PATTERN = re.compile(
+        r"HTTP Error (429|403)|Too Many Requests|Forbidden|timed out|timeout",
+        re.IGNORECASE,
+    )
+
+    def __init__(self, config):
+        initial = int(config.get("workers", 4))
+        self.min_workers = max(1, int(config.get("min_workers", 1)))
+        # 明示的に指定された初期値が上限を超える場合は、上限をそれに合わせます
+        self.max_workers = max(
+            self.min_workers, int(config.get("max_workers", 8)), initial
+        )
+        self.limit = min(max(initial, self.min_workers), self.max_workers)
+        self._reset_window()
+        self._last_throughput = 0.0
+
+    def _reset_window(self):
+        """スループット計測ウィンドウを初期化する"""
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_count = 0
+
+    def record(self, result):
+        """ダウンロード結果を記録し、必要に応じて並列数を調整する"""
+        if not result.get("success") and self.THROTTLE_PATTERN.search(
+            result.get("error_message") or ""
+        ):
+            # スロットリングを検知したら乗算的に減らします
+            new_limit = max(self.min_workers, self.limit // 2)
+            if new_limit != self.limit:
+                print(f"スロットリングを検知しました。並列数を {self.limit} → {new_limit} に減らします。")
+            self.limit = new_limit
+            self._last_throughput = 0.0
+            self._reset_window()
+            return
+
+        if filepath := result.get("filepath"):
+            try:
+                self._window_bytes += os.path.getsize(filepath)
+            except OSError:
+                pass
+        self._window_count += 1
+
+        # 現在の並列数ぶん完了するごとにスループットを評価します
+        if self._window_count < self.limit:
+            return
+        elapsed = max(time.monotonic() - self._window_start, 1e-6)
+        throughput = self._window_bytes / elapsed
+        if throughput >= self._last_throughput and self.limit < self.max_workers:
+            # スループットが伸びている間は加算的に増やします
+            self.limit += 1
+            print(f"スループット {throughput / 1024 / 1024:.2f} MiB/s。並列数を {self.limit} に増やします。")
+        self._last_throughput = throughput
+        self._reset_window()
+
+
+class RetryScheduler:
+    """ダウンロードエラーを分類し、一時的なエラーをバックオフ付きで再試行するためのクラス"""
+
+    # 再試行しても成功しないエラー（非公開・削除済み・対応していないURLなど）
+    PERMANENT_PATTERN = re.compile(
+        r"Video unavailable|Private video|This video (is|has been) (private|removed|unavailable)"
+        r"|members[- ]only|Join this channel|copyright|account .*terminated"
+        r"|not available in your country|Sign in to confirm your age|age[- ]restricted"
+        r"|HTTP Error (400|401|404|410)|Unsupported URL|Requested format is not available"
+        r"|live event will begin|Premieres in|is not a valid URL",
+        re.IGNORECASE,
+    )
+    # サーバーからのレート制限
+    THROTTLED_PATTERN = re.compile(
+        r"HTTP Error (429|403)|Too Many Requests|Forbidden|rate[- ]limit"
+        r"|confirm you.re not a bot",
+        re.IGNORECASE,
+    )
+    # ネットワークの一時的な障害
+    TRANSIENT_PATTERN = re.compile(
+        r"timed out|timeout|Connection (reset|refused|aborted)|Remote end closed"
+        r"|Temporary failure|Name or service not known|Network is unreachable"
+        r"|IncompleteRead|EOF occurred|SSL|HTTP Error 5\d\d|fragment .* not found"
+        r"|giving up after|Unable to download (webpage|API page|video data)",
+        re.IGNORECASE,
+    )
+    # レート制限時はバックオフを長めにとります
+    THROTTLED_FACTOR = 4
+
+    def __init__(self, config):
+        self.max_attempts = max(1, int(config.get("retry_max_attempts", 4)))
+        self.base_delay = float(config.get("retry_base_delay", 5))
+        self.max_delay = float(config.get("retry_max_delay", 300))
+        self._queue = []
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def classify(self, error_message):
+        """エラーメッセージを"permanent"・"throttled"・"transient"のいずれかに分類する"""
+        message = error_message or ""
+        if self.PERMANENT_PATTERN.search(message):
+            return "permanent"
+        if self.THROTTLED_PATTERN.search(message):
+            return "throttled"
+        if self.TRANSIENT_PATTERN.search(message):
+            return "transient"
+        # 原因が分からないエラーは、同じ失敗を繰り返さないよう再試行しません
+        return "permanent"
+
+    def schedule(self, item, attempt, error_class):
+        """再試行が可能であれば待ち行列に追加し、待機秒数を返す（再試行しない場合はNone）"""
+        if error_class == "permanent" or attempt >= self.max_attempts:
+            return None
+        delay = self.base_delay * 2 ** (attempt - 1)
+        if error_class == "throttled":
+            delay *= self.THROTTLED_FACTOR
+        # 同時に失敗した動画が一斉に再試行しないよう、待機時間を揺らします
+        delay = min(self.max_delay, delay) * random.uniform(0.5, 1.0)
+        self._counter += 1
+        heapq.heappush(self._queue, (time.monotonic() + delay, self._counter, item))
+        return delay
+
+    def pop_ready(self):
+        """待機時間が経過した再試行を1件取り出す（なければNone）"""
+        if self._queue and self._queue[0][0] <= time.monotonic():
+            return heapq.heappop(self._queue)[2]
+        return None
+
+    def next_delay(self):
+        """次の再試行までの秒数を返す（待ち行列が空の場合はNone）"""
+        if not self._queue:
+            return None
+        return max(0.0, self._queue[0][0] - time.monotonic())
+
+
+class YoutubeDLPool:
+    """ワーカースレッドごとに、オプションの組み合わせ単位でYoutubeDLインスタンスを使い回すクラス
+
+    抽出器やCookie、HTTP接続の初期化を動画ごとに繰り返さないようにする。
+    出力テンプレートはインスタンスを作り直さずに動画ごとに差し替える。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._instances = []
+
+    def get(self, options):
+        """現在のスレッドで、optionsに対応するYoutubeDLインスタンスを返す"""
+        from yt_dlp import YoutubeDL
+
+        options = dict(options)
+        outtmpl = options.pop("outtmpl", None)
+        key = json.dumps(options, sort_keys=True, default=repr)
+
+        instances = self._local.__dict__.setdefault("instances", {})
+        if (ydl := instances.get(key)) is None:
+            ydl = YoutubeDL(options)
+            instances[key] = ydl
+            with self._lock:
+                self._instances.append(ydl)
+
+        # インスタンスは同じスレッドでのみ使われるため、テンプレートをそのまま差し替えます
+        if outtmpl is not None:
+            ydl.params["outtmpl"]["default"] = outtmpl
+        return ydl
+
+    def close(self):
+        """作成したすべてのインスタンスを閉じる（Cookieの保存と接続の解放）"""
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception as e:
+                print(f"yt-dlpの終了処理中にエラーが発生しました: {e}")
+        self._local = threading.local()
+
+
+class RateLimiter:
+    """すべてのダウンロードとGoogle Driveへのアップロードで共有する、トークンバケット方式の帯域制限クラス
+
+    帯域はmax_rateで指定し、rate_limit_scheduleで時間帯ごとに変更できる。
+    コマンドラインの--max-rate（max_rate_override）は時間帯の指定より優先される。
+    不足分を先取りして待機するため、待ち時間は要求した順に公平に割り当てられる。
+    """
+
+    # バケットに貯められるトークン量（秒数分）
+    BURST_SECONDS = 1.0
+
+    def __init__(self, config):
+        self.default_rate = self._parse_rate(config.get("max_rate"))
+        self.schedule = config.get("rate_limit_schedule", [])
+        if (rate_override := config.get("max_rate_override")) is not None:
+            # コマンドラインで指定された帯域は、時間帯に関係なく常に適用します
+            self.default_rate = self._parse_rate(rate_override)
+            self.schedule = []
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self._current_rate = None
+        self._progress = {}
+
+    @staticmethod
+    def _parse_rate(value):
+        """"5M"などの帯域指定をバイト/秒に変換する（未指定や0は無制限としてNone）"""
+        if value in (None, "", 0, "0"):
+            return None
+        from yt_dlp.utils import parse_bytes
+
+        return parse_bytes(str(value)) or None
+
+    @staticmethod
+    def _in_period(start, end, now):
+        """現在時刻がstart〜endの時間帯に含まれるかを返す（日付をまたぐ指定にも対応）"""
+        if start <= end:
+            return start <= now < end
+        return now >= start or now < end
+
+    def current_rate(self):
+        """現在の時間帯に適用される帯域（バイト/秒、無制限はNone）を返す"""
+        now = datetime.now().strftime("%H:%M")
+        for period in self.schedule:
+            if self._in_period(period.get("start", "00:00"), period.get("end", "24:00"), now):
+                return self._parse_rate(period.get("max_rate"))
+        return self.default_rate
+
+    def consume(self, amount):
+        """amountバイト分のトークンを消費し、帯域を超える場合は必要な時間だけ待機する"""
+        from yt_dlp.utils import format_bytes
+
+        rate = self.current_rate()
+        with self._lock:
+            if rate != self._current_rate:
+                print(f"帯域上限: {format_bytes(rate) + '/s' if rate else '無制限'}")
+                self._current_rate = rate
+                self._tokens = 0.0
+            if not rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(
+                rate * self.BURST_SECONDS, self._tokens + (now - self._last) * rate
+            )
+            self._last = now
+            self._tokens -= amount
+            delay = -self._tokens / rate if self._tokens < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+    def progress_hook(self, d):
+        """yt-dlpの進捗フックとして、前回からの増分を帯域として消費する"""
+        key = d.get("tmpfilename") or d.get("filename")
+        if d.get("status") != "downloading":
+            with self._lock:
+                self._progress.pop(key, None)
+            return
+        downloaded = d.get("downloaded_bytes") or 0
+        with self._lock:
+            # フラグメントの並列ダウンロードでは進捗が前後することがあるため最大値で管理します
+            previous = self._progress.get(key, 0)
+            self._progress[key] = max(previous, downloaded)
+        if downloaded > previous:
+            self.consume(downloaded - previous)
+
+
+class StageMetrics:
+    """動画ごと・ステージごとの処理時間と転送量を記録するクラス
+
+    各記録はJSONLファイルに1行ずつ追記し、ステージごとの集計は
+    Prometheus（node-exporterのtextfile collector）形式のテキストファイルに出力する。
+    """
+
+    # テキストファイルを書き換える最短の間隔（秒）
+    TEXTFILE_INTERVAL = 10
+
+    def __init__(self, config, metrics_path=None):
+        self.path = metrics_path if config.get("enable_metrics", True) else None
+        self.textfile = config.get("metrics_textfile") or None
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._gauges = {}
+        self._peak_speeds = {}
+        self._textfile_written = 0.0
+
+    @contextmanager
+    def measure(self, stage, url=None, **fields):
+        """withブロックの処理時間を記録する（ブロック内で返される辞書に項目を追加できる）"""
+        record = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception:
+            record["success"] = False
+            raise
+        finally:
+            self.record(stage, url, time.perf_counter() - start, **record)
+
+    def record(self, stage, url, duration, success=True, nbytes=None, **fields):
+        """ステージ1回分の処理時間を記録する"""
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "stage": stage,
+            "url": url,
+            "duration": round(duration, 3),
+            "success": success,
+        }
+        if nbytes is not None:
+            entry["bytes"] = nbytes
+            entry["avg_speed"] = round(nbytes / duration) if duration > 0 else None
+        entry.update(fields)
+
+        with self._lock:
+            totals = self._totals.setdefault(
+                stage, {"success": 0, "failure": 0, "seconds": 0.0, "bytes": 0}
+            )
+            totals["success" if success else "failure"] += 1
+            totals["seconds"] += duration
+            totals["bytes"] += nbytes or 0
+            self._gauges[stage] = entry
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            if time.monotonic() - self._textfile_written >= self.TEXTFILE_INTERVAL:
+                self._write_textfile()
+
+    def progress_hook(self, d):
+        """yt-dlpの進捗フックとして、動画ごとの最大ダウンロード速度を記録する"""
+        if d.get("status") != "downloading" or not (speed := d.get("speed")):
+            return
+        key = download_key(d.get("info_dict"))
+        with self._lock:
+            self._peak_speeds[key] = max(self._peak_speeds.get(key, 0), speed)
+
+    def pop_peak_speed(self, info):
+        """動画の最大ダウンロード速度（バイト/秒）を取り出す"""
+        with self._lock:
+            speed = self._peak_speeds.pop(download_key(info), None)
+        return round(speed) if speed else None
+
+    def flush(self):
+        """集計をテキストファイルに書き出す"""
+        with self._lock:
+            self._write_textfile()
+
+    def _write_textfile(self):
+        """集計をPrometheusのテキスト形式で書き出す（ロックを取得した状態で呼び出す）"""
+        self._textfile_written = time.monotonic()
+        if not self.textfile:
+            return
+        lines = [
+            "# HELP youtubedler_stage_runs_total Number of processed stage runs.",
+            "# TYPE youtubedler_stage_runs_total counter",
+        ]
+        for stage, totals in sorted(self._totals.items()):
+            for result in ("success", "failure"):
+                lines.append(
+                    f'youtubedler_stage_runs_total{{stage="{stage}",result="{result}"}} {totals[result]}'
+                )
+        for name, key, help_text in (
+            ("stage_seconds_total", "seconds", "Total time spent in each stage."),
+            ("stage_bytes_total", "bytes", "Total bytes handled by each stage."),
+        ):
+            lines.append(f"# HELP youtubedler_{name} {help_text}")
+            lines.append(f"# TYPE youtubedler_{name} counter")
+            for stage, totals in sorted(self._totals.items()):
+                lines.append(f'youtubedler_{name}{{stage="{stage}"}} {totals[key]:g}')
+        lines.append("# HELP youtubedler_stage_last_seconds Duration of the latest run of each stage.")
+        lines.append("# TYPE youtubedler_stage_last_seconds gauge")
+        for stage, entry in sorted(self._gauges.items()):
+            lines.append(f'youtubedler_stage_last_seconds{{stage="{stage}"}} {entry["duration"]:g}')
+        if download := self._gauges.get("download"):
+            lines.append("# HELP youtubedler_download_speed_bytes Speed of the latest download.")
+            lines.append("# TYPE youtubedler_download_speed_bytes gauge")
+            for stat, key in (("avg", "avg_speed"), ("peak", "peak_speed")):
+                if download.get(key) is not None:
+                    lines.append(f'youtubedler_download_speed_bytes{{stat="{stat}"}} {download[key]}')
+        lines.append("# HELP youtubedler_metrics_updated_timestamp_seconds Time of the latest update.")
+        lines.append("# TYPE youtubedler_metrics_updated_timestamp_seconds gauge")
+        lines.append(f"youtubedler_metrics_updated_timestamp_seconds {time.time():.0f}")
+
+        # 収集中に書きかけのファイルを読まれないよう、一時ファイルから置き換えます
+        temp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(temp_path, self.textfile)
+        except OSError as e:
+            print(f"メトリクスのテキストファイルの書き込みに失敗しました: {e}")
+
+
+class StageProfiler:
+    """すべてのスレッドのスタックを一定間隔でサンプリングし、処理時間の内訳を集計するクラス
+
+    サンプルはスレッド名を根とするcollapsed-stack形式（flamegraph.pl、speedscope等で表示可能）で
+    書き出し、ホットスポットはスタック上で最も内側にあるパイプラインのクラスごとに集計する。
+    """
+
+    STAGES = ("YoutubeDownloader", "FileSorter", "ErrorLogger", "NotionUploader")
+    # ロックやキューの待機中のサンプルはホットスポットから除外します
+    IDLE_FILES = ("threading.py", "queue.py")
+
+    def __init__(self, output_path, interval=0.005):
+        self.output_path = output_path
+        self.interval = interval
+        self._stacks = {}
+        self._hotspots = {}
+        self._threads = {}
+        self._idle = 0
+        self._rounds = 0
+        self._elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """サンプリングを開始する"""
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="StageProfiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """サンプリングを終了し、collapsed-stackファイルを書き出す"""
+        self._stop.set()
+        self._thread.join()
+        self._elapsed = time.perf_counter() - self._start_time
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write(f"{';'.join(stack)} {count}\n")
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._sample(names.get(thread_id, str(thread_id)), frame)
+            self._rounds += 1
+
+    def _sample(self, thread_name, frame):
+        """1スレッド分のスタックを記録する"""
+        innermost = frame.f_code
+        if os.path.basename(innermost.co_filename) in self.IDLE_FILES or (
+            innermost.co_name == "_worker"
+            and innermost.co_filename.endswith(os.path.join("concurrent", "futures", "thread.py"))
+        ):
+            self._idle += 1
+            return
+
+        labels = []
+        stage = "その他"
+        while frame is not None:
+            code = frame.f_code
+            qualname = getattr(code, "co_qualname", code.co_name)
+            if stage == "その他" and qualname.split(".")[0] in self.STAGES:
+                stage = qualname.split(".")[0]
+            labels.append(
+                f"{qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+        labels.append(thread_name)
+        stack = tuple(reversed(labels))
+        self._stacks[stack] = self._stacks.get(stack, 0) + 1
+        key = (stage, labels[0])
+        self._hotspots[key] = self._hotspots.get(key, 0) + 1
+        self._threads[thread_name] = self._threads.get(thread_name, 0) + 1
+
+    def print_report(self, top_n=5):
+        """ステージごとのサンプル数と、ステージ内の上位N件のホットスポットを表示する"""
+        busy = sum(self._hotspots.values())
+        # 1サンプルあたりの実時間（スレッドごとのCPU時間ではなく、実行中・I/O待ちを含む経過時間）
+        per_sample = self._elapsed / self._rounds if self._rounds else self.interval
+        print("\n--- プロファイル ---")
+        print(
+            f"経過時間: {self._elapsed:.1f}秒, サンプル: {busy}件"
+            f"（待機中の{self._idle}件を除く）, 出力: {self.output_path}"
+        )
+        if not busy:
+            return
+
+        totals = {}
+        for (stage, _), count in self._hotspots.items():
+            totals[stage] = totals.get(stage, 0) + count
+        for stage, total in sorted(totals.items(), key=lambda x: -x[1]):
+            print(f"\n[{stage}] {total / busy:.1%}（約{total * per_sample:.1f}秒）")
+            hotspots = sorted(
+                ((count, func) for (s, func), count in self._hotspots.items() if s == stage),
+                reverse=True,
+            )
+            for count, func in hotspots[:top_n]:
+                print(f"  {count / busy:6.1%}  {func}")
+
+        print("\nスレッドごとのサンプル数:")
+        for name, count in sorted(self._threads.items(), key=lambda x: -x[1])[:top_n]:
+            print(f"  {count / busy:6.1%}  {name}")
+
+
 class YoutubeDownloader:
     """YouTube動画のダウンロードを処理するクラス"""
 
-    def __init__(self, config, error_logger):
+    # 再エンコードせずにコンテナへ格納できる(映像, 音声)コーデックの接頭辞
+    NATIVE_CODECS = {
+        "mp4": (
+            ("avc1", "avc3", "h264", "hev1", "hvc1", "av01"),
+            ("mp4a", "aac", "mp3", "ac-3", "ec-3"),
+        ),
+        "webm": (("vp8", "vp9", "vp09", "av01"), ("opus", "vorbis")),
+    }
+    # 形式ごとに優先してダウンロードする、コンテナ本来のコーデック
+    NATIVE_FORMAT_FILTERS = {
+        "mp4": ("[vcodec^=avc1]", "[acodec^=mp4a]"),
+        "webm": ("[vcodec~='^(vp0?9|av01)']", "[acodec=opus]"),
+    }
+
+    def __init__(
+        self,
+        config,
+        error_logger,
+        result_handler=None,
+        archive=None,
+        metadata_cache=None,
+        progress=None,
+        rate_limiter=None,
+        metrics=None,
+    ):
         self.config = config
         self.error_logger = error_logger
-
-    def run(self, video_url, temp_dir, final_dest_display):
+        self.archive = archive
+        self.metadata_cache = metadata_cache
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics or StageMetrics(config)
+        # 処理済み件数と総数（常駐モードの状態問い合わせで参照されます）
+        self.progress = progress if progress is not None else {}
+        # 各動画の完了時に呼び出されるコールバック（FileSorter.submitなど）
+        self.result_handler = result_handler
+        self.ydl_pool = YoutubeDLPool()
+        # yt-dlpのフックで記録した、動画IDごとの生成ファイル
+        self._artifacts = {}
+        self._artifacts_lock = threading.Lock()
+        # 1動画あたりのフラグメント並列数の上限（_process_groupsで並列数に応じて決まります）
+        self.fragment_limit = self._get_max_connections()
+
+    def run(self, video_url, temp_dir, final_dest_display, manifest=None):
         """スクリプトのメイン処理を実行し、ダウンロード結果を返す"""
-        if not video_url or "https" not in video_url:
-            print("有効なURLが指定されていません。")
-            return []
+        return self.run_batch([(video_url, manifest)], temp_dir, final_dest_display)[0]
+
+    def run_batch(self, jobs, temp_dir, final_dest_display):
+        """複数のURLを先に列挙し、すべての動画を共有のワーカープールで処理する
 
+        jobsは(URL, JobManifest)のリストで、URLごとの結果のリストを同じ順序で返す。
+        """
         _, format_choice = self._get_default_format()
         if not format_choice:
-            return []
+            return [[] for _ in jobs]
+
+        try:
+            groups = [
+                self._enumerate(
+                    video_url, manifest, temp_dir, final_dest_display, format_choice
+                )
+                for video_url, manifest in jobs
+            ]
+            self._process_groups([g for g in groups if g], format_choice)
+        finally:
+            self.ydl_pool.close()
+        return [g["results"] if g else [] for g in groups]
+
+    def _enumerate(self, video_url, manifest, temp_dir, final_dest_display, format_choice):
+        """URLの情報を取得し、ダウンロード対象の動画をまとめたグループを返す"""
+        if not video_url or "https" not in video_url:
+            print("有効なURLが指定されていません。")
+            return None
+
+        # 中断したジョブの再開時は、記録済みの列挙結果を使います
+        if manifest and (info := manifest.playlist_info()):
+            print(f"処理対象: {info.get('title', 'タイトル不明')}")
+            print(f"フォーマット: {format_choice}")
+            return self._enumerate_playlist(info, manifest, temp_dir, format_choice)
+
+        # 動画URLの場合は、情報を取得する前にアーカイブを確認します
+        if self._is_archived(video_url, format_choice):
+            print(f"ダウンロード済みのためスキップします: {video_url}")
+            return None
 
         try:
             ydl_opts = self._get_base_ydl_options()
             ydl_opts.update(
                 {"quiet": True, "extract_flat": True, "skip_download": True}
             )
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=False)
+            ydl = self.ydl_pool.get(ydl_opts)
+            # 再生リストのエントリの取得は、列挙中に"enumerate"として別に記録します
+            with self.metrics.measure("resolve", video_url):
+                # 再生リストのエントリは処理せずに受け取り、ページ単位で遅延取得します
+                info = self._extract_info(ydl, video_url, "flat", process=False)
+                if info.get("_type") in ("url", "url_transparent"):
+                    # リダイレクトなどの場合は、参照先まで解決してから処理します
+                    info = self._extract_info(ydl, video_url, "resolved")
 
             print(f"処理対象: {info.get('title', 'タイトル不明')}")
             print(f"URL: {video_url}")
@@ -694,21 +2095,63 @@ class YoutubeDownloader:
             print(f"一時ディレクトリ: {temp_dir}")
             print(f"フォーマット: {format_choice}")
 
-            if "entries" in info and info.get("entries"):
-                return self._process_playlist(info, temp_dir, format_choice)
-            else:
-                return [self._process_single_video(video_url, temp_dir, format_choice)]
+            if "entries" in info and info.get("entries") is not None:
+                info.setdefault("original_url", video_url)
+                return self._enumerate_playlist(info, manifest, temp_dir, format_choice)
+
+            # 単一動画の場合は取得済みの情報をそのまま再利用します
+            return {
+                "playlist_info": None,
+                "manifest": None,
+                "output_dir": temp_dir,
+                "pending": [(video_url, info)],
+                "results": [],
+            }
         except Exception as e:
             clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(e))
             print(f"予期しないエラーが発生しました: {clean_error_msg}")
             self.error_logger.log(video_url, f"予期しないエラー: {clean_error_msg}")
-            return []
+            return None
+
+    def _extract_info(self, ydl, url, kind, refresh=False, **kwargs):
+        """メタデータキャッシュを介してyt-dlpで情報を取得する（ダウンロードは行わない）
+
+        refreshがTrueの場合はキャッシュを読まずに取得し直し、キャッシュを上書きする。
+        """
+        cache_key = f"{kind}:{url}"
+        # 同期モードでは新しいエントリを見逃さないよう、再生リストは毎回取得します
+        use_cache = (
+            self.metadata_cache
+            and not refresh
+            and not (kind == "flat" and self.config.get("sync_mode", False))
+        )
+        if use_cache and (info := self.metadata_cache.get(cache_key)):
+            return info
+        info = ydl.extract_info(url, download=False, **kwargs)
+        # 遅延取得中の再生リストは、列挙を終えた時点でキャッシュします
+        if (
+            self.metadata_cache
+            and info
+            and isinstance(info.get("entries", []), list)
+        ):
+            self.metadata_cache.put(cache_key, info)
+        return info
+
+    def _is_archived(self, url, format_choice, entry=None):
+        """ダウンロードアーカイブに記録済みかどうかを返す（--force指定時は常にFalse）"""
+        if not self.archive or self.config.get("force_download", False):
+            return False
+        # 複数形式の場合は、すべての形式が記録済みのときだけスキップします
+        key = DownloadArchive.make_key(url, entry)
+        return all(
+            self.archive.contains(key, fmt) for fmt in split_formats(format_choice)
+        )
 
     def _get_default_format(self):
         """デフォルトのフォーマットを取得する"""
         # コマンドラインからのオーバーライドを優先
         if format_override := self.config.get("format_override"):
-            return None, format_override
+            return None, ",".join(split_formats(format_override))
 
         directories = self.config.get("directories", [])
         default_index = self.config.get("default_directory_index", 0)
@@ -716,7 +2159,41 @@ class YoutubeDownloader:
             print("フォーマット設定が見つかりません。")
             return None, None
         dir_info = directories[default_index]
-        return dir_info.get("path"), dir_info.get("format")
+        return dir_info.get("path"), ",".join(split_formats(dir_info.get("format")))
+
+    def _get_profile(self):
+        """選択中のディレクトリ設定（プロファイル）を返す"""
+        directories = self.config.get("directories", [])
+        index = self.config.get("default_directory_index", 0)
+        return directories[index] if 0 <= index < len(directories) else {}
+
+    def _get_profile_setting(self, key, default=None):
+        """プロファイルの設定値を返す（未設定の場合は全体の設定値）"""
+        value = self._get_profile().get(key)
+        if value in (None, ""):
+            value = self.config.get(key, default)
+        return value
+
+    def _get_max_connections(self):
+        """フラグメント数×並列ダウンロード数の上限を取得する"""
+        return max(1, int(self.config.get("max_connections", 16)))
+
+    def _get_fragment_options(self):
+        """DASH/HLSのフラグメント並列数、HTTPチャンクサイズ、バッファサイズのオプションを生成する"""
+        from yt_dlp.utils import parse_bytes
+
+        fragments = int(self._get_profile_setting("concurrent_fragments", 4) or 1)
+        options = {
+            "concurrent_fragment_downloads": max(1, min(fragments, self.fragment_limit))
+        }
+        for key, option in (("http_chunk_size", "http_chunk_size"), ("buffer_size", "buffersize")):
+            if (value := self._get_profile_setting(key)) in (None, ""):
+                continue
+            if (size := parse_bytes(str(value))) is None:
+                print(f"{key} の値が不正なため無視します: {value}")
+                continue
+            options[option] = size
+        return options
 
     def _get_base_ydl_options(self):
         """認証や共通設定に関する基本的なyt-dlpオプションを生成する"""
@@ -734,11 +2211,21 @@ class YoutubeDownloader:
         return options
 
     def _get_download_options(self, dl_dir, format_choice):
-        """yt-dlpのダウンロードオプションを生成する"""
+        """yt-dlpのダウンロードオプションを生成する（ffmpegによる変換は後処理ステージで行う）"""
         video_quality = self.config.get("video_quality", "best")
         options = self._get_base_ydl_options()
-        options.update({"outtmpl": os.path.join(dl_dir, "%(title)s.%(ext)s")})
+        # 一時ディレクトリは共有し、同じ動画が複数の再生リストに含まれることもあるため、
+        # ファイル名はダウンロードごとのキーで一意にします
+        options.update(
+            {"outtmpl": os.path.join(dl_dir, "%(id)s.%(download_key)s.%(ext)s")}
+        )
+        options.update(self._get_fragment_options())
+        options["progress_hooks"] = [self._track_artifact, self.metrics.progress_hook]
+        # 帯域制限はすべてのワーカーで共有するRateLimiterが進捗フックで行います
+        if self.rate_limiter:
+            options["progress_hooks"].append(self.rate_limiter.progress_hook)
 
+        # 映像と音声の結合にはffmpegが必要です
         if ffmpeg_path := self.config.get("ffmpeg_path"):
             options["ffmpeg_location"] = ffmpeg_path
 
@@ -747,116 +2234,447 @@ class YoutubeDownloader:
             if str(video_quality).isdigit() and video_quality != "best"
             else ""
         )
-        postprocessors = []
 
-        if format_choice in ["mp4", "webm"]:
+        # 複数形式の場合はすべての形式を作成できるソースを1回だけダウンロードします
+        formats = split_formats(format_choice)
+        if video_formats := [fmt for fmt in formats if fmt in ["mp4", "webm"]]:
+            # コンテナ本来のコーデックを優先し、再エンコードせずに格納できるようにします
+            video_filter, audio_filter = self.NATIVE_FORMAT_FILTERS[video_formats[0]]
             options["format"] = (
-                f"bestvideo{quality_selector}+bestaudio/best{quality_selector}/best"
-            )
-            postprocessors.append(
-                {"key": "FFmpegVideoConvertor", "preferedformat": format_choice}
+                f"bestvideo{video_filter}{quality_selector}+bestaudio{audio_filter}"
+                f"/bestvideo{quality_selector}+bestaudio/best{quality_selector}/best"
             )
-        elif format_choice in ["mp3", "wav", "flac"]:
+        elif formats and all(fmt in ["mp3", "wav", "flac"] for fmt in formats):
             options["format"] = "bestaudio/best"
+        else:
+            options["format"] = "best"
+        return options
+
+    def _get_postprocess_options(self, format_choice, keep_source=False, info=None):
+        """後処理ステージで使うyt-dlpのポストプロセッサオプションを生成する"""
+        options = {"quiet": True}
+        # 複数形式に変換する場合は、変換元のファイルを最後の形式まで残します
+        if keep_source:
+            options["keepvideo"] = True
+        if ffmpeg_path := self.config.get("ffmpeg_path"):
+            options["ffmpeg_location"] = ffmpeg_path
+
+        postprocessors = []
+        if format_choice in ["mp4", "webm"]:
+            # コーデックがそのまま格納できる場合は、ストリームコピーでコンテナだけを変更します
+            if self._conversion_method(info, format_choice) == "transcode":
+                key = "FFmpegVideoConvertor"
+            else:
+                key = "FFmpegVideoRemuxer"
+            postprocessors.append({"key": key, "preferedformat": format_choice})
+        elif format_choice in ["mp3", "wav", "flac"]:
             pp = {"key": "FFmpegExtractAudio", "preferredcodec": format_choice}
             if format_choice == "mp3":
                 pp["preferredquality"] = "192"
             postprocessors.append(pp)
-        else:
-            options["format"] = "best"
 
+        if not postprocessors:
+            return None
+
+        ffmpeg_args = options.setdefault("postprocessor_args", {}).setdefault(
+            "ffmpeg", []
+        )
+        # 同時に実行されるffmpegがCPUを奪い合わないよう、ジョブごとのスレッド数を制限します
+        ffmpeg_args.extend(["-threads", str(self._get_ffmpeg_threads())])
         if self.config.get("enable_volume_adjustment", False):
             volume_filter = ["volume", str(self.config.get("volume_level", 1.0))]
-            options.setdefault("postprocessor_args", {}).setdefault(
-                "ffmpeg", []
-            ).extend(["-af"] + volume_filter)
-
-        if postprocessors:
-            options["postprocessors"] = postprocessors
+            ffmpeg_args.extend(["-af"] + volume_filter)
+        # エンコードプリセットは再エンコードを行うポストプロセッサにだけ渡します
+        # （yt-dlpはポストプロセッサ名の引数とffmpeg共通の引数を連結して渡します）
+        if encoder_args := preset_args(self._get_encoding_preset(), format_choice):
+            pp_key = "videoconvertor" if format_choice in ["mp4", "webm"] else "extractaudio"
+            options["postprocessor_args"][pp_key] = encoder_args
+
+        options["postprocessors"] = postprocessors
+        options["postprocessor_hooks"] = [self._track_artifact]
         return options
 
-    def _download_video(self, url, output_dir, format_choice):
-        """指定されたURLの動画をダウンロードし、結果を辞書で返す"""
+    def _get_postprocess_workers(self):
+        """後処理ステージの並列数を取得する（既定はCPUコア数）"""
+        return max(1, int(self.config.get("postprocess_workers") or os.cpu_count() or 1))
+
+    def _get_ffmpeg_threads(self):
+        """ffmpegの1ジョブあたりのスレッド数を取得する（既定はコア数を並列数で割った値）"""
+        if threads := self._get_profile_setting("ffmpeg_threads"):
+            return max(1, int(threads))
+        return max(1, (os.cpu_count() or 1) // self._get_postprocess_workers())
+
+    def _get_encoding_preset(self):
+        """再エンコード時のプリセット（fast/balanced/archive）を取得する（未指定はNone）"""
+        # コマンドラインからのオーバーライドを優先
+        if not (
+            preset := self.config.get("encoding_preset_override")
+            or self._get_profile_setting("encoding_preset")
+        ):
+            return None
+        if preset not in ENCODING_PRESETS:
+            print(f"encoding_preset の値が不正なため無視します: {preset}")
+            return None
+        return preset
+
+    def _track_artifact(self, d):
+        """yt-dlpの進捗・後処理フックから、生成されたファイルのパスを記録する"""
+        info = d.get("info_dict") or {}
+        # 進捗フックはfilename、後処理フックはinfo_dictのfilepathでファイルを通知します
+        path = d.get("filename") or info.get("filepath")
+        if path and (key := download_key(info)):
+            with self._artifacts_lock:
+                self._artifacts.setdefault(key, set()).add(path)
+
+    def _pop_artifacts(self, info):
+        """記録済みの生成ファイルを取り出す"""
+        with self._artifacts_lock:
+            return self._artifacts.pop(download_key(info), set())
+
+    def _conversion_method(self, info, format_choice):
+        """ダウンロードしたファイルの変換方法（"none"/"remux"/"transcode"）を判定する"""
+        info = info or {}
+        if info.get("ext") == format_choice:
+            return "none"
+        vcodec = (info.get("vcodec") or "").lower()
+        acodec = (info.get("acodec") or "").lower()
+        if format_choice not in self.NATIVE_CODECS:
+            # 音声はコーデックが同じ場合のみ、yt-dlpが再エンコードせずに抽出します
+            return "remux" if acodec.startswith(format_choice) else "transcode"
+        # 音量調整のフィルタはストリームコピーと併用できません
+        if self.config.get("enable_volume_adjustment", False):
+            return "transcode"
+        video_codecs, audio_codecs = self.NATIVE_CODECS[format_choice]
+        if (vcodec == "none" or vcodec.startswith(video_codecs)) and (
+            acodec == "none" or acodec.startswith(audio_codecs)
+        ):
+            return "remux"
+        return "transcode"
+
+    def _needs_postprocess(self, format_choice):
+        """ダウンロード後に後処理ステージでの変換が必要かどうかを返す"""
+        formats = split_formats(format_choice)
+        return len(formats) > 1 or bool(self._get_postprocess_options(format_choice))
+
+    def _postprocess_video(self, result):
+        """ダウンロード済みのファイルをffmpegで変換し、結果を更新して返す"""
+        if not result["success"]:
+            return result
+        formats = split_formats(result["format"])
+        if len(formats) > 1:
+            return self._postprocess_outputs(result, formats)
+        if not (
+            pp_opts := self._get_postprocess_options(
+                result["format"], info=result["info"]
+            )
+        ):
+            return result
+
+        title = result["info"].get("title", "Unknown Title")
+        result["conversion"] = self._conversion_method(result["info"], result["format"])
+        print(f"後処理を開始: {title} ({result['conversion']})")
+        with self.metrics.measure(
+            "postprocess",
+            result["url"],
+            format=result["format"],
+            conversion=result["conversion"],
+        ) as metric:
+            try:
+                ydl = self.ydl_pool.get(pp_opts)
+                info = ydl.post_process(result["filepath"], result["info"])
+                result["info"] = info
+                result["filepath"] = info["filepath"]
+                print(f"✓ 後処理完了: {title}")
+            except Exception as e:
+                clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(e))
+                print(f"✗ 後処理中にエラーが発生しました: {clean_error_msg}")
+                result["success"] = metric["success"] = False
+                result["error_message"] = f"後処理失敗: {clean_error_msg}"
+        # 変換前後のファイルも、仕分け後に削除できるよう記録します
+        result["artifacts"] = sorted(
+            set(result.get("artifacts", []))
+            | self._pop_artifacts(result["info"])
+            | {result["filepath"]}
+        )
+        return result
+
+    def _postprocess_outputs(self, result, formats):
+        """1つのソースファイルから、指定されたすべての形式のファイルを作成する"""
+        title = result["info"].get("title", "Unknown Title")
+        source = result["filepath"]
+        outputs = []
+        for fmt in formats:
+            output = {"format": fmt, "filepath": source, "success": True, "error_message": None}
+            if pp_opts := self._get_postprocess_options(
+                fmt, keep_source=True, info=result["info"]
+            ):
+                output["conversion"] = self._conversion_method(result["info"], fmt)
+                print(f"後処理を開始: {title} ({fmt}, {output['conversion']})")
+                with self.metrics.measure(
+                    "postprocess", result["url"], format=fmt, conversion=output["conversion"]
+                ) as metric:
+                    try:
+                        ydl = self.ydl_pool.get(pp_opts)
+                        # 変換ごとに動画情報をコピーし、他の形式の出力パスで上書きされないようにします
+                        info = ydl.post_process(source, dict(result["info"]))
+                        output["filepath"] = info["filepath"]
+                        print(f"✓ 後処理完了: {title} ({fmt})")
+                    except Exception as e:
+                        clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(e))
+                        print(f"✗ 後処理中にエラーが発生しました ({fmt}): {clean_error_msg}")
+                        output["success"] = metric["success"] = False
+                        output["error_message"] = f"後処理失敗: {clean_error_msg}"
+            outputs.append(output)
+
+        result["outputs"] = outputs
+        failed = [o for o in outputs if not o["success"]]
+        result["success"] = not failed
+        result["error_message"] = "; ".join(o["error_message"] for o in failed) or None
+        # ソースファイルは、すべての出力を仕分けた後に削除します
+        result["artifacts"] = sorted(
+            set(result.get("artifacts", []))
+            | self._pop_artifacts(result["info"])
+            | {o["filepath"] for o in outputs}
+        )
+        return result
+
+    def _download_video(
+        self, url, output_dir, format_choice, info=None, refresh=False, key=None
+    ):
+        """指定されたURLの動画をダウンロードし、結果を辞書で返す（refresh・keyは再試行時に指定）"""
         print(f"\nダウンロード開始: {url}")
 
-        # まず、ダウンロードせずに動画情報を取得してディレクトリを作成します
-        info_opts = self._get_base_ydl_options()
-        info_opts.update({"quiet": True, "skip_download": True})
+        ydl_opts = self._get_download_options(output_dir, format_choice)
+
+        # 同じスレッド・同じオプションのインスタンスを使い回し、接続を維持します
+        ydl = self.ydl_pool.get(ydl_opts)
+        # 動画情報は一度だけ取得し、ダウンロード・結果・ログで使い回します
+        if info is None:
+            try:
+                with self.metrics.measure("extract", url):
+                    info = self._extract_info(
+                        ydl, url, "video", refresh=refresh, process=False
+                    )
+            except Exception as e:
+                clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(e))
+                print(f"✗ 動画情報の取得に失敗しました: {clean_error_msg}")
+                return {
+                    "success": False,
+                    "error_message": f"動画情報取得失敗: {clean_error_msg}",
+                    "info": {},
+                    "filepath": None,
+                    "url": url,
+                    "format": format_choice,
+                }
+
+        # 生成ファイルと最大速度は、このダウンロードのキーで記録します
+        # （再試行では同じキーを使い、書きかけのファイルから再開します）
+        info = {**info, "download_key": key or os.urandom(4).hex()}
         try:
-            with YoutubeDL(info_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            with self.metrics.measure("download", url) as metric:
+                try:
+                    # 取得済みの情報を処理してダウンロードします（再抽出は行いません）
+                    info = ydl.process_ie_result(info, download=True)
+                finally:
+                    metric["peak_speed"] = self.metrics.pop_peak_speed(info)
+
+                # 出力ファイルはyt-dlpが報告したパスから決定します（ディレクトリは走査しません）
+                downloads = info.get("requested_downloads") or []
+                actual_filepath = downloads[-1].get("filepath") if downloads else None
+                if not actual_filepath or not os.path.exists(actual_filepath):
+                    raise Exception("ダウンロードは成功しましたが、出力ファイルを特定できませんでした。")
+                metric["nbytes"] = os.path.getsize(actual_filepath)
+            artifacts = self._pop_artifacts(info) | {actual_filepath}
+
+            print(f"✓ ダウンロード成功: {info.get('title', 'Unknown Title')}")
+            return {
+                "success": True,
+                "error_message": None,
+                "info": info,
+                "filepath": actual_filepath,
+                # 保存先でのファイル名（拡張子を除く）は従来どおり動画のタイトルにします
+                "output_name": os.path.basename(
+                    ydl.prepare_filename(info, outtmpl="%(title)s")
+                ),
+                "artifacts": sorted(artifacts),
+                "url": url,
+                "format": format_choice,
+            }
         except Exception as e:
             clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(e))
-            print(f"✗ 動画情報の取得に失敗しました: {clean_error_msg}")
-            self.error_logger.log(url, f"動画情報取得失敗: {clean_error_msg}")
+            print(f"✗ エラーが発生しました: {clean_error_msg}")
+            # 事前に取得したinfo辞書があります
             return {
                 "success": False,
-                "error_message": f"動画情報取得失敗: {clean_error_msg}",
-                "info": {},
+                "error_message": clean_error_msg,
+                "info": info,
                 "filepath": None,
+                # 書きかけのファイルは最終的な失敗が確定した後に削除します
+                "artifacts": sorted(self._pop_artifacts(info)),
                 "url": url,
                 "format": format_choice,
             }
 
-        # 動画固有の一時ディレクトリを作成
-        video_title = info.get("title", "untitled_video")
-        safe_title = re.sub(r'[\/*?:"<>|]', "_", video_title)
-        video_temp_dir = os.path.join(output_dir, safe_title)
-        os.makedirs(video_temp_dir, exist_ok=True)
-        print(f"一時ディレクトリを作成: {video_temp_dir}")
+    def _enumerate_playlist(self, info, manifest, output_dir, format_choice):
+        """再生リストの動画を遅延列挙するグループを作成する"""
+        group = {
+            "playlist_info": info,
+            "manifest": manifest,
+            "output_dir": output_dir,
+            "pending": None,
+            "results": [],
+        }
+        if self.config.get("sync_mode", False) and self.archive:
+            # 同期モードでは、処理を終えた動画をこの再生リストの同期状態に記録します
+            group["sync"] = {
+                "playlist": DownloadArchive.make_playlist_key(info),
+                "keys": {},
+            }
 
-        ydl_opts = self._get_download_options(video_temp_dir, format_choice)
+        # ジョブのジャーナルに記録済みの動画は、ダウンロードせずに途中から再開します
+        resumed = []
+        if manifest:
+            manifest.start(info)
+            resumed = manifest.resumable_results()
+            if resumed:
+                print(f"ジョブに記録済みの {len(resumed)} 件をダウンロードせずに再開します。")
 
-        with YoutubeDL(ydl_opts) as ydl:
+        group["pending"] = self._iter_playlist(
+            group, format_choice, {r["url"] for r in resumed}
+        )
+        for result in resumed:
+            result["playlist_info"] = info
+            group["results"].append(result)
+            if self.result_handler:
+                self.result_handler(result, manifest)
+        return group
+
+    @staticmethod
+    def _iter_entries(entries):
+        """再生リストのエントリを順に返す（PagedListはページ単位で取得する）"""
+        from yt_dlp.utils import PagedList
+
+        if not isinstance(entries, PagedList):
+            yield from entries
+            return
+        start = 0
+        while page := entries.getslice(start, start + 50):
+            yield from page
+            start += len(page)
+
+    @staticmethod
+    def _timed_iter(iterable, elapsed):
+        """要素の取得にかかった時間をelapsed[0]に加算しながら要素を返す"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
             try:
-                ydl.download([url])
-                
-                downloaded_files = os.listdir(video_temp_dir)
-                if not downloaded_files:
-                    raise Exception("ダウンロードは成功しましたが、一時ディレクトリ内でファイルが見つかりませんでした。")
-                
-                # Sort by modification time to find the most recent file.
-                downloaded_files.sort(key=lambda f: os.path.getmtime(os.path.join(video_temp_dir, f)))
-                actual_filename = downloaded_files[-1]
-                actual_filepath = os.path.join(video_temp_dir, actual_filename)
-
-                print(f"✓ ダウンロード成功: {info.get('title', 'Unknown Title')}")
-                return {
-                    "success": True,
-                    "error_message": None,
-                    "info": info,
-                    "filepath": actual_filepath,
-                    "url": url,
-                    "format": format_choice,
-                }
-            except Exception as e:
-                clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(e))
-                print(f"✗ エラーが発生しました: {clean_error_msg}")
-                # 事前に取得したinfo辞書があります
-                return {
-                    "success": False,
-                    "error_message": clean_error_msg,
-                    "info": info,
-                    "filepath": None,
-                    "url": url,
-                    "format": format_choice,
-                }
-
-    def _process_single_video(self, url, output_dir, format_choice):
-        """単一動画のダウンロード処理"""
-        print("個別動画をダウンロードしています...")
-        return self._download_video(url, output_dir, format_choice)
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed[0] += time.perf_counter() - start
+            yield item
+
+    def _iter_playlist(self, group, format_choice, resumed_urls):
+        """再生リストのエントリを取得しながら、ダウンロード対象の(URL, 動画情報)を返すジェネレータ"""
+        info = group["playlist_info"]
+        manifest = group["manifest"]
+        enumerated = []
+        journal_batch = []
+        skipped = 0
+        sync = group.get("sync")
+        stop_after = max(1, int(self.config.get("sync_stop_after", 10)))
+        consecutive_seen = 0
+        stopped = False
+        # エントリの取得（ページの読み込み）にかかった時間だけを計測します
+        fetch_seconds = [0.0]
+        try:
+            for entry in self._timed_iter(
+                self._iter_entries(info.get("entries") or []), fetch_seconds
+            ):
+                if not isinstance(entry, dict) or "url" not in entry:
+                    continue
+                url = entry["url"]
+                # キャッシュ用には最小限のキーのみ保持し、メモリ使用量を抑えます
+                enumerated.append(
+                    {k: entry[k] for k in ("_type", "url", "id", "ie_key", "title") if k in entry}
+                )
+                if manifest:
+                    journal_batch.append(url)
+                    if len(journal_batch) >= 100:
+                        manifest.add_entries(journal_batch)
+                        journal_batch = []
+
+                if url in resumed_urls:
+                    continue
+                if sync:
+                    # 同期済みの動画が続いたら、それ以降のページは取得しません
+                    key = DownloadArchive.make_key(url, entry)
+                    archived = self._is_archived(url, format_choice, entry)
+                    if archived or self.archive.is_synced(sync["playlist"], key):
+                        if archived:
+                            self.archive.mark_synced(sync["playlist"], [key])
+                        skipped += 1
+                        consecutive_seen += 1
+                        if consecutive_seen >= stop_after:
+                            print(
+                                f"同期済みの動画が {consecutive_seen} 件続いたため、再生リストの列挙を終了します。"
+                            )
+                            stopped = True
+                            break
+                        continue
+                    consecutive_seen = 0
+                    sync["keys"][url] = key
+                elif self._is_archived(url, format_choice, entry):
+                    skipped += 1
+                    continue
+                yield url, None
+        except Exception as e:
+            # 列挙の途中で失敗した場合、ジョブは列挙未完了のまま残り、再開時に取得し直します
+            clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(e))
+            print(f"再生リストの列挙中にエラーが発生しました: {clean_error_msg}")
+            self.error_logger.log(
+                info.get("original_url"), f"再生リストの列挙失敗: {clean_error_msg}"
+            )
+            if manifest and journal_batch:
+                manifest.add_entries(journal_batch)
+            self.metrics.record(
+                "enumerate",
+                info.get("original_url"),
+                fetch_seconds[0],
+                success=False,
+                entries=len(enumerated),
+            )
+            return
 
-    def _process_playlist(self, info, output_dir, format_choice):
-        """再生リストのダウンロード処理"""
-        results = []
-        video_urls = [
-            entry["url"] for entry in info.get("entries", []) if "url" in entry
-        ]
+        self.metrics.record(
+            "enumerate",
+            info.get("original_url"),
+            fetch_seconds[0],
+            entries=len(enumerated),
+            stopped=stopped,
+        )
+        if manifest:
+            manifest.add_entries(journal_batch)
+            manifest.finish_enumeration()
+        # 途中で打ち切った列挙結果は再生リスト全体としてキャッシュしません
+        if (
+            self.metadata_cache
+            and not stopped
+            and not isinstance(info.get("entries"), list)
+        ):
+            self.metadata_cache.put(
+                f"flat:{info['original_url']}",
+                {**{k: v for k, v in info.items() if k != "entries"}, "entries": enumerated},
+            )
+        if skipped:
+            print(f"ダウンロード済みの {skipped} 件をスキップします。")
 
-        if not video_urls:
+        if not enumerated and not resumed_urls:
             print("再生リストから動画URLを取得できませんでした。")
-            return [
+            group["playlist_info"] = None
+            group["results"].append(
                 {
                     "success": False,
                     "error_message": "再生リストからURL取得失敗",
@@ -865,57 +2683,490 @@ class YoutubeDownloader:
                     "url": info["original_url"],
                     "format": format_choice,
                 }
-            ]
+            )
 
-        playlist_dir = self._create_temp_playlist_directory(
-            output_dir, info.get("title", "playlist")
+    def _process_groups(self, groups, format_choice):
+        """すべてのグループの動画を、共有のダウンロード・後処理ステージで処理する"""
+        # 再生リストは列挙しながら処理し、すべてのエントリを先に展開しません
+        pending = (
+            (group, url, info, 1, None)
+            for group in groups
+            for url, info in group["pending"]
         )
-
-        # ThreadPoolExecutorを使用して並列ダウンロードを実行
+        window = deque()
+        enumerated = 0
+        exhausted = False
+        self.progress.update(total=0, completed=0)
+
+        # 並列数はConcurrencyControllerが結果に応じて調整します
+        controller = ConcurrencyController(self.config)
+        # 一時的なエラーで失敗した動画は、新しい動画の後ろで再試行します
+        retries = RetryScheduler(self.config)
+        print(
+            f"並列ダウンロード数: {controller.limit} (最小 {controller.min_workers} / 最大 {controller.max_workers})"
+        )
+        # 同時接続数がmax_connectionsを超えないよう、動画数が少ないほどフラグメントを多く並列化します
+        for item in pending:
+            window.append(item)
+            if len(window) >= controller.max_workers:
+                break
+        if not window:
+            return
+        self.fragment_limit = max(
+            1, self._get_max_connections() // min(controller.max_workers, len(window))
+        )
+        print(
+            f"フラグメント並列数: {self._get_fragment_options()['concurrent_fragment_downloads']} (同時接続数の上限 {self._get_max_connections()})"
+        )
+        # ffmpegの変換はダウンロードとは別の後処理ステージで実行し、
+        # ネットワークとCPUをそれぞれ独立して使い切れるようにします
+        pp_workers = self._get_postprocess_workers()
+        print(f"後処理の並列数: {pp_workers} (ffmpegスレッド数: {self._get_ffmpeg_threads()})")
         with ThreadPoolExecutor(
-            max_workers=4
-        ) as executor:  # 4つの並列ワーカーを使用。これは後で設定可能にできます。
-            futures = {
-                executor.submit(
-                    self._download_video, url, playlist_dir, format_choice
-                ): url
-                for url in video_urls
-            }
-
-            for i, future in enumerate(as_completed(futures), 1):
-                url = futures[future]
-                print(f"\n再生リストの処理中 ({i}/{len(video_urls)}): {url}")
-                try:
-                    result = future.result()
-                    result["playlist_info"] = info
-                    results.append(result)
-                except Exception as exc:
-                    print(f"✗ {url} のダウンロードで例外が発生しました: {exc}")
-                    # エラーをログに記録
-                    clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(exc))
-                    self.error_logger.log(url, f"並列処理中の例外: {clean_error_msg}")
-                    # 再生リストの処理の一貫性を保つために失敗結果を作成
-                    results.append(
-                        {
-                            "success": False,
-                            "error_message": clean_error_msg,
-                            "info": {},  # 例外が早期に発生した場合、infoが利用できない可能性があります
-                            "filepath": None,
-                            "url": url,
-                            "format": format_choice,
-                            "playlist_info": info,
+            max_workers=controller.max_workers
+        ) as executor, ThreadPoolExecutor(max_workers=pp_workers) as pp_executor:
+            futures = {}
+            pp_futures = {}
+            completed = 0
+            enumerated = len(window)
+            while True:
+                while len(futures) < controller.limit:
+                    if window:
+                        group, url, info, attempt, key = window.popleft()
+                    elif item := retries.pop_ready():
+                        group, url, info, attempt, key = item
+                    else:
+                        break
+                    futures[
+                        executor.submit(
+                            self._download_video,
+                            url,
+                            group["output_dir"],
+                            format_choice,
+                            info,
+                            # 再試行では期限切れの署名付きURLを使わないよう、キャッシュを使いません
+                            attempt > 1,
+                            key,
+                        )
+                    ] = (group, url, attempt)
+
+                # 列挙は並列数の2倍まで先読みし、未処理の動画をそれ以上保持しません
+                while not exhausted and len(window) < 2 * controller.limit:
+                    if (item := next(pending, None)) is None:
+                        exhausted = True
+                        break
+                    window.append(item)
+                    enumerated += 1
+                self.progress["total"] = enumerated
+                if not (window or futures or pp_futures or retries):
+                    break
+
+                if not futures and not pp_futures:
+                    if window:
+                        continue
+                    # 再試行待ちの動画しか残っていない場合は、次の再試行まで待機します
+                    time.sleep(retries.next_delay())
+                    continue
+                done, _ = wait(
+                    list(futures) + list(pp_futures),
+                    timeout=retries.next_delay(),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    if future in pp_futures:
+                        group, url = pp_futures.pop(future)
+                        result = future.result()
+                    else:
+                        group, url, attempt = futures.pop(future)
+                        try:
+                            result = future.result()
+                            controller.record(result)
+                            result["attempts"] = attempt
+                            if not result["success"]:
+                                error_class = retries.classify(result["error_message"])
+                                result["error_class"] = error_class
+                                # 再試行時は動画情報を取得し直し、期限切れのURLを使わないようにします
+                                # ダウンロードキーは引き継ぎ、書きかけのファイルから再開します
+                                key = (result["info"] or {}).get("download_key")
+                                delay = retries.schedule(
+                                    (group, url, None, attempt + 1, key), attempt, error_class
+                                )
+                                if delay is not None:
+                                    print(
+                                        f"↻ {url} を{delay:.0f}秒後に再試行します（{error_class}、{attempt}/{retries.max_attempts}回目の失敗）"
+                                    )
+                                    continue
+                        except Exception as exc:
+                            print(f"✗ {url} のダウンロードで例外が発生しました: {exc}")
+                            # エラーをログに記録
+                            clean_error_msg = re.sub(r"\x1b\[[0-9;]*m", "", str(exc))
+                            self.error_logger.log(url, f"並列処理中の例外: {clean_error_msg}")
+                            # 再生リストの処理の一貫性を保つために失敗結果を作成
+                            result = {
+                                "success": False,
+                                "error_message": clean_error_msg,
+                                "info": {},  # 例外が早期に発生した場合、infoが利用できない可能性があります
+                                "filepath": None,
+                                "url": url,
+                                "format": format_choice,
+                                "attempts": attempt,
+                            }
+                        if group["playlist_info"] is not None:
+                            result["playlist_info"] = group["playlist_info"]
+                        if result["success"] and self._needs_postprocess(format_choice):
+                            # ダウンロードの枠を空けて、変換は後処理ステージに渡します
+                            if group["manifest"] and group["playlist_info"]:
+                                group["manifest"].update_entry(url, state="downloaded")
+                            pp_futures[
+                                pp_executor.submit(self._postprocess_video, result)
+                            ] = (group, url)
+                            continue
+
+                    completed += 1
+                    self.progress["completed"] = completed
+                    total = f"{enumerated}" if exhausted else f"{enumerated}+"
+                    print(f"\n処理中 ({completed}/{total}): {url}")
+                    # 仕分けに不要な大きいキーを削除し、長い再生リストでもメモリ使用量を抑えます
+                    if result.get("info"):
+                        result["info"] = self._compact_info(result["info"])
+                    if (sync := group.get("sync")) and (
+                        key := sync["keys"].pop(url, None)
+                    ):
+                        # 同期状態は仕分けが完了してアーカイブに記録された時点で記録します
+                        result["sync"] = {
+                            "playlist": sync["playlist"],
+                            "key": key,
+                            "formats": split_formats(format_choice),
                         }
-                    )
-
-        return results
+                    if group["manifest"] and group["playlist_info"]:
+                        group["manifest"].record_result(result)
+                    group["results"].append(result)
+                    # 完了した動画はすぐに仕分けステージへ渡します
+                    if self.result_handler:
+                        self.result_handler(result, group["manifest"])
+
+    @staticmethod
+    def _compact_info(info):
+        """動画情報からフォーマット一覧やサムネイルなどの大きいキーを除いたものを返す"""
+        heavy_keys = (
+            "formats",
+            "requested_formats",
+            "thumbnails",
+            "subtitles",
+            "automatic_captions",
+            "heatmap",
+            "http_headers",
+            "fragments",
+        )
+        return {k: v for k, v in info.items() if k not in heavy_keys}
+
+
+class DownloadDaemon:
+    """常駐してローカルのHTTPエンドポイントでジョブを受け付け、順番に処理するクラス"""
+
+    # ジョブとして受け付ける項目（コマンドライン引数と同じ名前）
+    JOB_FIELDS = (
+        "format",
+        "quality",
+        "output",
+        "index",
+        "dest_type",
+        "no_notion",
+        "no_log",
+        "no_watch",
+        "workers",
+        "force",
+        "refresh_metadata",
+        "archive_path",
+        "max_rate",
+        "sync",
+        "preset",
+    )
 
-    def _create_temp_playlist_directory(self, base_dir, playlist_title):
-        """一時的な再生リスト用のディレクトリを作成する"""
-        safe_title = re.sub(r'[\/*?:"<>|]', "_", playlist_title)
-        playlist_dir = os.path.join(base_dir, safe_title)
-        os.makedirs(playlist_dir, exist_ok=True)
-        print(f"一時的な再生リスト用ディレクトリを作成: {playlist_dir}")
-        return playlist_dir
+    def __init__(self, config_path, base_dir, port):
+        self.config_path = config_path
+        self.base_dir = base_dir
+        self.port = port
+        # 他のWebページなどからジョブを送信されないよう、トークンを知っているクライアントのみ受け付けます
+        self.token = load_daemon_token(Config(config_path), base_dir, create=True)
+        self.jobs = {}
+        self.gdrive_service = None
+        # メトリクスの集計はジョブをまたいで累積します
+        self.metrics = create_metrics(Config(config_path), base_dir)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def serve_forever(self):
+        """ジョブの処理スレッドとHTTPサーバーを起動する"""
+        threading.Thread(target=self._worker, daemon=True).start()
+        server = ThreadingHTTPServer(("127.0.0.1", self.port), self._make_handler())
+        print(f"常駐モードで待機しています: http://127.0.0.1:{self.port}/jobs")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("常駐モードを終了します。")
+        finally:
+            server.server_close()
+
+    def submit(self, payload):
+        """ジョブを受け付けてキューに追加し、ジョブの状態を返す"""
+        urls = payload.get("urls") or ([payload["url"]] if payload.get("url") else [])
+        urls = list(dict.fromkeys(u for u in urls if u and "https" in u))
+        if not urls:
+            raise ValueError("有効なURLが指定されていません。")
+
+        # コマンドライン引数と同じ型・選択肢で検証し、上書き設定を作成します
+        parser = build_parser()
+        parser.exit_on_error = False
+        try:
+            args = parser.parse_args(self._payload_to_argv(parser, payload))
+        except argparse.ArgumentError as e:
+            raise ValueError(str(e)) from e
+
+        job_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        job = {
+            "id": job_id,
+            "urls": urls,
+            "overrides": build_overrides(args),
+            "status": "queued",
+            "submitted_at": datetime.now().isoformat(),
+            "progress": {"completed": 0, "total": 0},
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+        self._queue.put(job_id)
+        print(f"ジョブを受け付けました: {job_id} ({len(urls)}件のURL)")
+        return self.get_job(job_id)
+
+    def _payload_to_argv(self, parser, payload):
+        """ジョブの項目を、対応するコマンドライン引数のリストに変換する"""
+        actions = {action.dest: action for action in parser._actions}
+        argv = []
+        for key in self.JOB_FIELDS:
+            if (value := payload.get(key)) is None:
+                continue
+            action = actions[key]
+            if action.nargs == 0:
+                # store_trueのフラグは真偽値のみ受け付けます
+                if not isinstance(value, bool):
+                    raise ValueError(f"{key} には true または false を指定してください。")
+                if value:
+                    argv.append(action.option_strings[-1])
+                continue
+            if key == "format" and isinstance(value, list):
+                value = ",".join(map(str, value))
+            if isinstance(value, (dict, list, bool)):
+                raise ValueError(f"{key} の値が不正です: {value}")
+            argv.append(f"{action.option_strings[-1]}={value}")
+        return argv
+
+    def get_job(self, job_id):
+        """ジョブの状態のコピーを返す"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def list_jobs(self):
+        """すべてのジョブの状態を返す"""
+        with self._lock:
+            return json.loads(json.dumps(list(self.jobs.values())))
+
+    def _update_job(self, job_id, **fields):
+        """ジョブの状態を更新する"""
+        with self._lock:
+            self.jobs[job_id].update(fields)
+
+    def _worker(self):
+        """キューのジョブを順番に処理する"""
+        jobs_dir = self.base_dir / "設定・履歴/jobs"
+        while True:
+            job_id = self._queue.get()
+            job = self.jobs[job_id]
+            self._update_job(
+                job_id, status="running", started_at=datetime.now().isoformat()
+            )
+            try:
+                # 設定ファイルの変更を反映するため、設定はジョブごとに読み込みます
+                config = Config(self.config_path, job["overrides"])
+                manifests = [
+                    (url, JobManifest(jobs_dir, url=url, overrides=job["overrides"]))
+                    for url in job["urls"]
+                ]
+                results, gdrive_service = execute_jobs(
+                    config,
+                    manifests,
+                    self.base_dir,
+                    gdrive_service=self.gdrive_service,
+                    progress=job["progress"],
+                    metrics=self.metrics,
+                )
+                self.gdrive_service = gdrive_service or self.gdrive_service
+                success_count = sum(1 for r in results if r["success"])
+                self._update_job(
+                    job_id,
+                    status="done",
+                    manifests=[m.job_id for _, m in manifests],
+                    summary={
+                        "total": len(results),
+                        "success": success_count,
+                        "failed": len(results) - success_count,
+                    },
+                )
+                print_summary(results)
+            except Exception as e:
+                print(f"ジョブ {job_id} の処理中にエラーが発生しました: {e}")
+                self._update_job(job_id, status="failed", error=str(e))
+            finally:
+                self._update_job(job_id, finished_at=datetime.now().isoformat())
+
+    def _make_handler(self):
+        """HTTPリクエストハンドラのクラスを作成する"""
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _authorized(self):
+                """Authorizationヘッダーのトークンを確認し、一致しなければ401を返す"""
+                header = self.headers.get("Authorization", "")
+                if hmac.compare_digest(header.encode(), f"Bearer {daemon.token}".encode()):
+                    return True
+                self._send(401, {"error": "トークンが正しくありません。"})
+                return False
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                if self.path.rstrip("/") == "/jobs":
+                    self._send(200, daemon.list_jobs())
+                elif self.path.startswith("/jobs/"):
+                    job = daemon.get_job(self.path[len("/jobs/"):])
+                    if job:
+                        self._send(200, job)
+                    else:
+                        self._send(404, {"error": "ジョブが見つかりません。"})
+                else:
+                    self._send(404, {"error": "Not Found"})
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                if self.path.rstrip("/") != "/jobs":
+                    self._send(404, {"error": "Not Found"})
+                    return
+                # フォームなどのクロスサイトの単純リクエストを受け付けないよう、JSONのみ許可します
+                if self.headers.get_content_type() != "application/json":
+                    self._send(415, {"error": "Content-Typeはapplication/jsonを指定してください。"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                    self._send(202, daemon.submit(payload))
+                except (ValueError, AttributeError) as e:
+                    self._send(400, {"error": str(e)})
+
+            def _send(self, status, body):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                # アクセスログは出力しません
+                pass
+
+        return Handler
+
+
+def load_daemon_token(config, base_dir, create=False):
+    """常駐プロセスのトークンを読み込む（createがTrueで存在しない場合は作成する）"""
+    token_path = Path(
+        config.get("daemon_token_path") or base_dir / "設定・履歴/daemon_token"
+    )
+    try:
+        if token := token_path.read_text(encoding="utf-8").strip():
+            return token
+    except FileNotFoundError:
+        pass
+    if not create:
+        return None
+    token = os.urandom(32).hex()
+    os.makedirs(token_path.parent, exist_ok=True)
+    # 自分以外のユーザーから読めないよう、権限を制限して作成します
+    fd = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def request_daemon(port, path, payload=None, token=None):
+    """常駐プロセスにリクエストを送信し、JSONの応答を返す（payloadがあればPOST）"""
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        data=json.dumps(payload).encode("utf-8") if payload is not None else None,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token or ''}",
+        },
+        method="POST" if payload is not None else "GET",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read().decode("utf-8") or "{}")
+    except urllib.error.URLError as e:
+        print(f"常駐プロセスに接続できませんでした (ポート {port}): {e.reason}")
+        return None
+
+
+def read_url_list(path):
+    """ファイル（"-"の場合は標準入力）から1行に1つずつURLを読み込む"""
+    try:
+        if path == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+    except OSError as e:
+        print(f"URLリストの読み込みに失敗しました: {e}")
+        return []
+    # 空行と#で始まるコメント行は無視します
+    return [
+        line.strip()
+        for line in lines
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def split_formats(format_choice):
+    """カンマ区切りの形式指定（"webm,mp3"など）を、重複を除いた形式のリストにする"""
+    if isinstance(format_choice, (list, tuple)):
+        items = format_choice
+    else:
+        items = str(format_choice or "").split(",")
+    formats = []
+    for item in items:
+        if (fmt := str(item).strip().lower()) and fmt not in formats:
+            formats.append(fmt)
+    return formats
+
+
+def download_key(info):
+    """yt-dlpの情報辞書から、ダウンロード1回分を識別するキーを返す"""
+    info = info or {}
+    return info.get("download_key") or info.get("id")
+
+
+def format_list(value):
+    """-f/--formatの値を検証し、カンマ区切りの形式指定として返す"""
+    formats = split_formats(value)
+    supported = ["mp4", "webm", "mp3", "wav", "flac"]
+    if not formats or any(fmt not in supported for fmt in formats):
+        raise argparse.ArgumentTypeError(
+            f"対応していない形式です: {value}（対応形式: {', '.join(supported)}）"
+        )
+    return ",".join(formats)
 
 
 def print_summary(results):
@@ -927,6 +3178,8 @@ def print_summary(results):
     print(f"\n{'='*50}")
     print("処理完了！")
     print(f"総数: {total}, 成功: {success_count}, 失敗: {failed_count}")
+    if retried := sum(1 for r in results if r["success"] and r.get("attempts", 1) > 1):
+        print(f"再試行で成功: {retried}件")
     if failed_count > 0:
         print(f"⚠️ {failed_count}件の処理に失敗しました。")
     else:
@@ -934,8 +3187,8 @@ def print_summary(results):
     print(f"{'='*50}")
 
 
-def main():
-    """メイン処理"""
+def build_parser():
+    """コマンドライン引数のパーサを作成する"""
     parser = argparse.ArgumentParser(
         description="YouTube動画をダウンロードし、整理します。"
     )
@@ -945,11 +3198,16 @@ def main():
         default=None,
         help="ダウンロードする動画または再生リストのURL。指定しない場合はクリップボードから取得します。",
     )
+    parser.add_argument(
+        "--input",
+        metavar="FILE",
+        help="ダウンロードするURLを1行に1つずつ記載したファイルを指定します（\"-\"で標準入力）。",
+    )
     parser.add_argument(
         "-f",
         "--format",
-        choices=["mp4", "webm", "mp3", "wav", "flac"],
-        help="ダウンロード形式を指定します。",
+        type=format_list,
+        help="ダウンロード形式を指定します（mp4, webm, mp3, wav, flac）。カンマ区切りで複数指定すると、1回のダウンロードから各形式を作成します (例: webm,mp3)。",
     )
     parser.add_argument(
         "-q", "--quality", help="動画の品質を指定します (例: 1080, 720, best)。"
@@ -979,12 +3237,246 @@ def main():
         action="store_true",
         help="YouTubeで「視聴済み」としてマークする機能を無効にします。",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="再生リストの並列ダウンロード数の初期値を指定します。",
+    )
+    parser.add_argument(
+        "--max-rate",
+        metavar="RATE",
+        help="すべてのダウンロードとアップロードで共有する帯域の上限を指定します（例: 5M）。0で無制限です。",
+    )
+    parser.add_argument(
+        "--preset",
+        choices=list(ENCODING_PRESETS),
+        help="再エンコードが必要な場合のエンコードプリセットを指定します（fastは速度優先、archiveは品質・サイズ優先）。",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="ダウンロードアーカイブに記録済みの動画も再ダウンロードします。",
+    )
+    parser.add_argument(
+        "--archive-path",
+        help="ダウンロードアーカイブ（SQLite）のファイルパスを指定します。",
+    )
+    parser.add_argument(
+        "--refresh-metadata",
+        action="store_true",
+        help="メタデータキャッシュを使わずに、動画・再生リストの情報を取得し直します。",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="再生リストを先頭から確認し、同期済みの動画が続いた時点で列挙を終了します（差分のみ処理）。",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="JOB_ID",
+        help="中断した再生リストのジョブを、ジョブIDを指定して途中から再開します。",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="常駐モードで起動し、ローカルのHTTPエンドポイントでジョブを受け付けます。",
+    )
+    parser.add_argument(
+        "--submit",
+        action="store_true",
+        help="起動中の常駐プロセスにジョブを送信します（ダウンロードはこのプロセスでは行いません）。",
+    )
+    parser.add_argument(
+        "--status",
+        nargs="?",
+        const="",
+        metavar="JOB_ID",
+        help="常駐プロセスのジョブの状態を表示します。JOB_IDを省略するとすべてのジョブを表示します。",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="設定・履歴/profile.folded",
+        metavar="FILE",
+        help="実行中のスタックをサンプリングし、collapsed-stack形式のファイルに保存してステージごとのホットスポットを表示します（既定: 設定・履歴/profile.folded）。",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=5,
+        metavar="N",
+        help="--profileで表示するステージごとのホットスポットの件数を指定します（既定: 5）。",
+    )
     parser.add_argument(
         "--save", action="store_true", help="指定した引数を設定ファイルに保存します。"
     )
     parser.add_argument(
         "--show-config", action="store_true", help="現在の設定を表示して終了します。"
     )
+    return parser
+
+
+def build_overrides(args):
+    """コマンドライン引数から一時的な上書き設定を作成する"""
+    overrides = {
+        "format_override": args.format,
+        "output_override": args.output,
+        "video_quality": args.quality,
+        "destination": args.dest_type,
+        "default_directory_index": args.index,
+        "workers": args.workers,
+        "archive_path": args.archive_path,
+        "max_rate_override": args.max_rate,
+        "encoding_preset_override": args.preset,
+    }
+    if args.no_notion:
+        overrides["enable_notion_upload"] = False
+    if args.no_log:
+        overrides["enable_logging"] = False
+    if args.no_watch:
+        overrides["mark_as_watched"] = False
+    if args.force:
+        overrides["force_download"] = True
+    if args.refresh_metadata:
+        overrides["refresh_metadata"] = True
+    if args.sync:
+        overrides["sync_mode"] = True
+
+    return {k: v for k, v in overrides.items() if v is not None}
+
+
+def resolve_staging_dir(config, base_dir, destination_dir):
+    """保存先と同じデバイス上の一時ディレクトリを決定する（移動をリネームで済ませるため）"""
+    default_dir = base_dir / "temp_downloads"
+    directories = config.get("directories", [])
+    index = config.get("default_directory_index", 0)
+    profile = directories[index] if 0 <= index < len(directories) else {}
+
+    # プロファイルで明示的に指定されている場合はそれを使います
+    if staging_dir := profile.get("staging_dir"):
+        return Path(staging_dir) / "temp_downloads"
+    if (
+        config.get("destination", "local") != "local"
+        or not destination_dir
+        or not os.path.isdir(destination_dir)
+    ):
+        return default_dir
+
+    os.makedirs(default_dir, exist_ok=True)
+    if os.stat(default_dir).st_dev == os.stat(destination_dir).st_dev:
+        return default_dir
+
+    # 別のデバイスの場合は、保存先の中の隠しディレクトリ、次に設定された代替先を試します
+    candidates = [Path(destination_dir) / ".temp_downloads"]
+    if fallback := config.get("staging_fallback_dir"):
+        candidates.append(Path(fallback) / "temp_downloads")
+    for candidate in candidates:
+        try:
+            os.makedirs(candidate, exist_ok=True)
+        except OSError as e:
+            print(f"一時ディレクトリを作成できませんでした: {candidate} ({e})")
+            continue
+        if os.access(candidate, os.W_OK):
+            print(f"保存先と同じデバイスの一時ディレクトリを使用します: {candidate}")
+            return candidate
+    print("保存先と同じデバイスに一時ディレクトリを用意できないため、ファイルはコピーして移動します。")
+    return default_dir
+
+
+def create_metrics(config, base_dir):
+    """設定に基づいてステージごとのメトリクスの記録先を作成する"""
+    return StageMetrics(
+        config,
+        config.get("metrics_path") or str(base_dir / "設定・履歴/metrics.jsonl"),
+    )
+
+
+def execute_jobs(
+    config, jobs, base_dir, gdrive_service=None, progress=None, metrics=None
+):
+    """ジョブ(URL, JobManifest)のリストをダウンロード・仕分けし、(結果, Driveサービス)を返す"""
+    # 表示用の最終的な保存先を取得
+    final_dest_display = config.get("output_override")
+    if not final_dest_display:
+        if config.get("destination") == "gdrive":
+            final_dest_display = "Google Drive"
+        else:
+            dirs = config.get("directories", [])
+            idx = config.get("default_directory_index", 0)
+            if 0 <= idx < len(dirs):
+                final_dest_display = dirs[idx].get("path", "（不明）")
+            else:
+                final_dest_display = "（不明）"
+
+    temp_dir = resolve_staging_dir(config, base_dir, final_dest_display)
+    os.makedirs(temp_dir, exist_ok=True)
+
+    error_logger = ErrorLogger(config)
+    archive = DownloadArchive(
+        config.get("archive_path") or str(base_dir / "設定・履歴/archive.db")
+    )
+    metadata_cache = (
+        MetadataCache(
+            config,
+            config.get("metadata_cache_path")
+            or str(base_dir / "設定・履歴/metadata_cache.db"),
+        )
+        if config.get("enable_metadata_cache", True)
+        else None
+    )
+
+    # ステージごとの処理時間は常駐モードではプロセス全体で集計します
+    metrics = metrics or create_metrics(config, base_dir)
+    notion_uploader = (
+        NotionUploader(config, error_logger, metrics)
+        if config.get("enable_notion_upload")
+        else None
+    )
+    # 帯域制限はダウンロードとGoogle Driveへのアップロードで共有します
+    rate_limiter = RateLimiter(config)
+    sorter = FileSorter(
+        config,
+        error_logger,
+        notion_uploader,
+        archive,
+        gdrive_service=gdrive_service,
+        rate_limiter=rate_limiter,
+        metrics=metrics,
+    )
+
+    # ダウンロードが完了した動画から順に仕分け・アップロードを行います
+    downloader = YoutubeDownloader(
+        config,
+        error_logger,
+        result_handler=sorter.submit,
+        archive=archive,
+        metadata_cache=metadata_cache,
+        progress=progress,
+        rate_limiter=rate_limiter,
+        metrics=metrics,
+    )
+    # すべてのURLを先に列挙し、動画は共有のワーカープールで処理します
+    batch_results = downloader.run_batch(jobs, temp_dir, final_dest_display)
+
+    download_results = []
+    for (_, manifest), results in zip(jobs, batch_results):
+        sorter.process_downloads(results, manifest)
+        download_results.extend(results)
+    sorter.close()
+    metrics.flush()
+
+    # 保存先に作成した一時ディレクトリは、空になっていれば削除します
+    if temp_dir != base_dir / "temp_downloads":
+        try:
+            os.rmdir(temp_dir)
+        except OSError:
+            pass
+    return download_results, sorter.gdrive_service
+
+
+def main():
+    """メイン処理"""
+    parser = build_parser()
     args = parser.parse_args()
 
     base_dir = Path(__file__).parent
@@ -1002,14 +3494,45 @@ def main():
             print("エラー: 設定ファイルが破損しているか、JSON形式ではありません。")
         return
 
+    daemon_config = Config(config_path)
+    daemon_port = int(daemon_config.get("daemon_port", 8799))
+    daemon_token = load_daemon_token(daemon_config, base_dir)
+    if args.daemon:
+        DownloadDaemon(config_path, base_dir, daemon_port).serve_forever()
+        return
+    if args.status is not None:
+        path = f"/jobs/{args.status}" if args.status else "/jobs"
+        if (response := request_daemon(daemon_port, path, token=daemon_token)) is not None:
+            print(json.dumps(response, indent=2, ensure_ascii=False))
+        return
+
     # --saveフラグが指定された場合、設定を保存
     if args.save:
         print("設定をconfig.jsonに保存します...")
         config_to_save = Config(config_path)
         config_to_save.update_from_args_and_save(args)
 
-    video_url = args.url
-    if not video_url:
+    # --resumeが指定された場合、中断したジョブのジャーナルを読み込みます
+    jobs_dir = base_dir / "設定・履歴/jobs"
+    resumed_job = None
+    if args.resume:
+        resumed_job = JobManifest(jobs_dir, args.resume)
+        if not resumed_job.job.get("playlist_info"):
+            print(f"再開できるジョブが見つかりません: {args.resume}")
+            return
+        if resumed_job.job.get("completed"):
+            print(f"ジョブ {args.resume} は既に完了しています。")
+            return
+
+    video_urls = []
+    if args.url:
+        video_urls.append(args.url)
+    if args.input:
+        video_urls.extend(read_url_list(args.input))
+    if resumed_job and not video_urls:
+        video_urls.append(resumed_job.url)
+
+    if not video_urls:
         # --saveが使用された場合、URLなしでもエラーにせず終了
         if args.save:
             print(
@@ -1017,69 +3540,77 @@ def main():
             )
             return
 
+        import pyperclip
+
         video_url = pyperclip.paste()
         print(f"【デバッグ】クリップボードから取得した内容: '{video_url}'")
         print(
             "コマンドライン引数にURLが指定されていないため、クリップボードからURLを取得しました。"
         )
+        video_urls.append(video_url)
 
-    if not video_url or "https" not in video_url:
+    for video_url in video_urls:
+        if not video_url or "https" not in video_url:
+            print(f"有効なURLではないためスキップします: '{video_url}'")
+    # 重複を除き、入力の順序を保ちます
+    video_urls = list(
+        dict.fromkeys(u for u in video_urls if u and "https" in u)
+    )
+    if not video_urls:
         print("有効なURLが指定されていません。")
         return
 
-    # 一時的な上書き設定を作成
-    overrides = {
-        "format_override": args.format,
-        "output_override": args.output,
-        "video_quality": args.quality,
-        "destination": args.dest_type,
-        "default_directory_index": args.index,
-    }
-    if args.no_notion:
-        overrides["enable_notion_upload"] = False
-    if args.no_log:
-        overrides["enable_logging"] = False
-    if args.no_watch:
-        overrides["mark_as_watched"] = False
+    # --submitが指定された場合、常駐プロセスにジョブを送信して終了します
+    if args.submit:
+        payload = {
+            key: value
+            for key, value in vars(args).items()
+            # 0は有効な値として送信し、未指定(None)と無効なフラグ(False)だけを除きます
+            if key in DownloadDaemon.JOB_FIELDS
+            and value is not None
+            and value is not False
+        }
+        payload["urls"] = video_urls
+        if (
+            response := request_daemon(daemon_port, "/jobs", payload, daemon_token)
+        ) is not None:
+            if "id" in response:
+                print(f"ジョブを送信しました: {response['id']}")
+                print(f"状態の確認: python {Path(__file__).name} --status {response['id']}")
+            else:
+                print(f"ジョブの送信に失敗しました: {response.get('error')}")
+        return
 
-    overrides = {k: v for k, v in overrides.items() if v is not None}
+    # 一時的な上書き設定を作成
+    overrides = build_overrides(args)
 
-    temp_dir = base_dir / "temp_downloads"
-    os.makedirs(temp_dir, exist_ok=True)
+    if resumed_job:
+        # 再開時は前回の実行時の上書き設定を引き継ぎます
+        overrides = {**resumed_job.overrides, **overrides}
+        jobs = [(resumed_job.url, resumed_job)]
+    else:
+        # URLごとにジョブを作成し、再生リストのグループとNotionの親アイテムを分けます
+        jobs = [
+            (video_url, JobManifest(jobs_dir, url=video_url, overrides=overrides))
+            for video_url in video_urls
+        ]
 
     config = Config(config_path, overrides)
-
-    # 表示用の最終的な保存先を取得
-    final_dest_display = config.get("output_override")
-    if not final_dest_display:
-        if config.get("destination") == "gdrive":
-            final_dest_display = "Google Drive"
-        else:
-            dirs = config.get("directories", [])
-            idx = config.get("default_directory_index", 0)
-            if 0 <= idx < len(dirs):
-                final_dest_display = dirs[idx].get("path", "（不明）")
-            else:
-                final_dest_display = "（不明）"
-
-    error_logger = ErrorLogger(config)
-
-    downloader = YoutubeDownloader(config, error_logger)
-    download_results = downloader.run(video_url, temp_dir, final_dest_display)
+    profiler = None
+    if args.profile:
+        profiler = StageProfiler(base_dir / args.profile)
+        profiler.start()
+    try:
+        download_results, _ = execute_jobs(config, jobs, base_dir)
+    finally:
+        if profiler:
+            profiler.stop()
+            profiler.print_report(args.profile_top)
 
     if not download_results:
         print("ダウンロード対象がありませんでした。")
         return
 
-    notion_uploader = (
-        NotionUploader(config, error_logger)
-        if config.get("enable_notion_upload")
-        else None
-    )
-    sorter = FileSorter(config, error_logger, notion_uploader)
-
-    sorter.process_downloads(download_results)
-
     print_summary(download_results)
 
 
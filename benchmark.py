@@ -0,0 +1,581 @@
+"""YoutubeDLer.pyのパイプライン全体のスループットをオフラインで計測するベンチマーク
+
+YouTubeの代わりに合成した再生リストを返すyt-dlpのエクストラクタを登録し、
+ローカルのHTTPサーバーから生成したメディアを配信します（遅延・帯域・エラーを注入可能）。
+NotionとGoogle Driveはローカルのフェイクに置き換え、並列数と形式の組み合わせごとに
+YoutubeDownloaderとFileSorterを通しで実行して、比較できるレポートを出力します。
+
+使い方:
+    python benchmark.py --videos 20 --workers 1 2 4 --formats webm mp3 webm,mp3
+    python benchmark.py --latency 0.2 --bandwidth 2M --error-rate 0.05 --report bench.jsonl
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from googleapiclient.http import MediaUploadProgress
+from yt_dlp.extractor import import_extractors
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.globals import extractors as extractors_context
+from yt_dlp.utils import OnDemandPagedList, format_bytes, parse_bytes
+
+import YoutubeDLer
+
+# 合成するメディア（DASHと同様に映像と音声を別々に配信します）
+MEDIA_FILES = {
+    "video.webm": (
+        ["-f", "lavfi", "-i", "testsrc=duration={seconds}:size=640x360:rate=25"],
+        ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-b:v", "1M"],
+        {"ext": "webm", "vcodec": "vp9", "acodec": "none", "width": 640, "height": 360},
+    ),
+    "video.mp4": (
+        ["-f", "lavfi", "-i", "testsrc=duration={seconds}:size=640x360:rate=25"],
+        ["-c:v", "libx264", "-preset", "ultrafast", "-b:v", "1M"],
+        {"ext": "mp4", "vcodec": "avc1.64001e", "acodec": "none", "width": 640, "height": 360},
+    ),
+    "audio.webm": (
+        ["-f", "lavfi", "-i", "sine=frequency=440:duration={seconds}"],
+        ["-c:a", "libopus", "-b:a", "128k"],
+        {"ext": "webm", "vcodec": "none", "acodec": "opus"},
+    ),
+    "audio.m4a": (
+        ["-f", "lavfi", "-i", "sine=frequency=440:duration={seconds}"],
+        ["-c:a", "aac", "-b:a", "128k"],
+        {"ext": "m4a", "vcodec": "none", "acodec": "mp4a.40.2"},
+    ),
+}
+
+# 動画ごとの処理時間に含めるステージ（列挙とNotionへの登録は再生リスト単位のため除外）
+VIDEO_STAGES = ("extract", "download", "postprocess", "sort")
+
+# YoutubeDLer.pyの読み込み時にインポートされてはいけない重いライブラリ
+HEAVY_MODULES = ("yt_dlp", "googleapiclient", "google_auth_oauthlib", "google.oauth2", "requests", "pyperclip")
+
+# 別プロセスで実行し、インポート時間と、引数で渡したモジュールのうち読み込まれたものを出力します
+STARTUP_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import YoutubeDLer
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "modules": [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+
+class MediaServer:
+    """合成メディアとNotion APIのフェイクを配信するローカルのHTTPサーバー"""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, media_dir, latency=0.0, bandwidth=None, error_rate=0.0, seed=0):
+        self.media_dir = Path(media_dir)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "bytes": 0, "notion": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        """サーバーを別スレッドで起動する"""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """サーバーを停止する"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _inject_error(self):
+        """指定された割合で失敗させるかどうかを返す"""
+        with self._lock:
+            return self.random.random() < self.error_rate
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._count("requests")
+                if server.latency:
+                    time.sleep(server.latency)
+                match = re.fullmatch(r"/media/\d+/([\w.]+)", self.path)
+                if not match or match.group(1) not in MEDIA_FILES:
+                    self.send_error(404)
+                    return
+                if server._inject_error():
+                    server._count("errors")
+                    self.send_error(503)
+                    return
+                self._send_file(server.media_dir / match.group(1))
+
+            def do_POST(self):
+                # Notion APIのフェイク（ページを作成したことにしてIDを返します）
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server._count("notion")
+                if server.latency:
+                    time.sleep(server.latency)
+                body = json.dumps({"id": str(uuid.uuid4())}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_file(self, path):
+                size = path.stat().st_size
+                start, end = 0, size - 1
+                if match := re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", "")):
+                    start = int(match.group(1))
+                    end = min(int(match.group(2) or end), end)
+                length = end - start + 1
+                self.send_response(206 if self.headers.get("Range") else 200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(length))
+                self.send_header("Accept-Ranges", "bytes")
+                if self.headers.get("Range"):
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.end_headers()
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    while length > 0:
+                        chunk = f.read(min(server.CHUNK_SIZE, length))
+                        if not chunk:
+                            break
+                        try:
+                            self.wfile.write(chunk)
+                        except (BrokenPipeError, ConnectionResetError):
+                            return
+                        length -= len(chunk)
+                        server._count("bytes", len(chunk))
+                        # 接続ごとの帯域を制限します
+                        if server.bandwidth:
+                            time.sleep(len(chunk) / server.bandwidth)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class BenchmarkVideoIE(InfoExtractor):
+    """合成メディアの動画情報を返すエクストラクタ"""
+
+    IE_NAME = "benchmark:video"
+    _VALID_URL = r"https://bench\.invalid/video/(?P<id>\d+)"
+
+    # ベンチマークの開始時に設定されます
+    server = None
+    media_sizes = {}
+    extract_latency = 0.0
+    duration = 0
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        if self.extract_latency:
+            time.sleep(self.extract_latency)
+        formats = []
+        for name, (_, _, fields) in MEDIA_FILES.items():
+            formats.append(
+                {
+                    "format_id": name.replace(".", "-"),
+                    "url": f"{self.server.base_url}/media/{video_id}/{name}",
+                    "filesize": self.media_sizes[name],
+                    "protocol": "http",
+                    **fields,
+                }
+            )
+        return {
+            "id": video_id,
+            "title": f"benchmark {video_id}",
+            "duration": self.duration,
+            "formats": formats,
+        }
+
+
+class BenchmarkPlaylistIE(InfoExtractor):
+    """指定した件数の動画を、ページ単位で遅延取得する再生リストとして返すエクストラクタ"""
+
+    IE_NAME = "benchmark:playlist"
+    _VALID_URL = r"https://bench\.invalid/playlist/(?P<id>\d+)"
+
+    PAGE_SIZE = 50
+
+    def _real_extract(self, url):
+        count = int(self._match_id(url))
+
+        def fetch_page(page):
+            if BenchmarkVideoIE.extract_latency:
+                time.sleep(BenchmarkVideoIE.extract_latency)
+            for i in range(page * self.PAGE_SIZE, min(count, (page + 1) * self.PAGE_SIZE)):
+                yield self.url_result(
+                    f"https://bench.invalid/video/{i}", BenchmarkVideoIE, str(i), f"benchmark {i}"
+                )
+
+        return self.playlist_result(
+            OnDemandPagedList(fetch_page, self.PAGE_SIZE), str(count), f"benchmark ({count})"
+        )
+
+
+class FakeDriveService:
+    """Google Drive APIのうち、FileSorterが使うfiles().create/listだけを再現するフェイク"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.uploaded = 0
+
+    def files(self):
+        return self
+
+    def list(self, **kwargs):
+        return FakeDriveRequest(result={"files": []})
+
+    def create(self, body, media_body=None, fields=None):
+        return FakeDriveRequest(self, body, media_body)
+
+
+class FakeDriveRequest:
+    """フォルダ作成のexecute()と、再開可能アップロードのnext_chunk()を再現する"""
+
+    def __init__(self, service=None, body=None, media=None, result=None):
+        self.service = service
+        self.body = body
+        self.media = media
+        self.result = result
+        self.sent = 0
+        self.file_id = str(uuid.uuid4())
+
+    def execute(self):
+        return self.result or {"id": self.file_id}
+
+    def next_chunk(self):
+        data = self.media.getbytes(self.sent, self.media.chunksize())
+        with open(self.service.root / self.file_id, "ab") as f:
+            f.write(data)
+        self.sent += len(data)
+        if self.sent < self.media.size():
+            return MediaUploadProgress(self.sent, self.media.size()), None
+        self.service.uploaded += 1
+        return None, {"id": self.file_id}
+
+
+def register_extractors():
+    """ベンチマーク用のエクストラクタを、汎用エクストラクタより先に照合されるよう登録する"""
+    import_extractors()
+    extractors_context.value = {
+        "BenchmarkPlaylistIE": BenchmarkPlaylistIE,
+        "BenchmarkVideoIE": BenchmarkVideoIE,
+        **extractors_context.value,
+    }
+
+
+def generate_media(ffmpeg, media_dir, seconds):
+    """ffmpegで映像と音声のテスト用メディアを生成し、ファイルサイズを返す"""
+    sizes = {}
+    for name, (inputs, codec_args, _) in MEDIA_FILES.items():
+        path = Path(media_dir) / name
+        command = [ffmpeg, "-y", "-loglevel", "error"]
+        command += [arg.format(seconds=seconds) for arg in inputs] + codec_args + [str(path)]
+        subprocess.run(command, check=True)
+        sizes[name] = path.stat().st_size
+    return sizes
+
+
+def percentile(values, fraction):
+    """値のリストのパーセンタイルを返す（線形補間）"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(metrics_path, results, wall_seconds):
+    """メトリクスのJSONLから、スループットと動画ごとの処理時間を集計する"""
+    records = []
+    if os.path.exists(metrics_path):
+        with open(metrics_path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+
+    # 動画ごとの処理時間は、最初のステージの開始から最後のステージの終了までとします
+    spans = {}
+    stage_seconds = {}
+    downloaded = 0
+    for record in records:
+        stage = record["stage"]
+        stage_seconds[stage] = stage_seconds.get(stage, 0.0) + record["duration"]
+        if stage == "download":
+            downloaded += record.get("bytes") or 0
+        if stage not in VIDEO_STAGES:
+            continue
+        end = datetime.fromisoformat(record["timestamp"]).timestamp()
+        start = end - record["duration"]
+        first, last = spans.get(record["url"], (start, end))
+        spans[record["url"]] = (min(first, start), max(last, end))
+    latencies = [end - start for start, end in spans.values()]
+
+    succeeded = sum(1 for r in results if r["success"])
+    return {
+        "videos": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "retried": sum(1 for r in results if r.get("attempts", 1) > 1),
+        "wall_seconds": round(wall_seconds, 3),
+        "videos_per_min": round(succeeded / wall_seconds * 60, 2) if wall_seconds else None,
+        "mb_per_s": round(downloaded / wall_seconds / 1e6, 3) if wall_seconds else None,
+        "p50_latency": round(percentile(latencies, 0.5) or 0, 3),
+        "p95_latency": round(percentile(latencies, 0.95) or 0, 3),
+        "stage_seconds": {k: round(v, 3) for k, v in sorted(stage_seconds.items())},
+    }
+
+
+def measure_startup(repeat):
+    """YoutubeDLer.pyのコールドスタートの時間と、読み込み時にインポートされた重いライブラリを返す"""
+    root = Path(__file__).parent
+    imports, totals, loaded = [], [], set()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_CODE, *HEAVY_MODULES], cwd=root, capture_output=True, text=True, check=True
+        ).stdout
+        totals.append(time.perf_counter() - start)
+        result = json.loads(output.splitlines()[-1])
+        imports.append(result["seconds"])
+        loaded.update(result["modules"])
+
+    # --show-configのようにダウンロードを行わない実行の所要時間も計測します
+    show_config = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(root / "YoutubeDLer.py"), "--show-config"],
+            cwd=root, capture_output=True, check=True,
+        )
+        show_config.append(time.perf_counter() - start)
+    return {
+        "import_ms": round(statistics.median(imports) * 1000, 1),
+        "process_ms": round(statistics.median(totals) * 1000, 1),
+        "show_config_ms": round(statistics.median(show_config) * 1000, 1),
+        "heavy_modules": sorted(loaded),
+    }
+
+
+def run_case(args, server, workers, format_choice):
+    """1つの組み合わせでパイプライン全体を実行し、集計結果を返す"""
+    base_dir = Path(tempfile.mkdtemp(prefix="youtubedler-bench-"))
+    settings_dir = base_dir / "設定・履歴"
+    settings_dir.mkdir()
+    output_dir = base_dir / "output"
+    output_dir.mkdir()
+    config_path = settings_dir / "config.json"
+    config_data = {
+        "destination": args.dest,
+        "google_drive_parent_folder_id": "benchmark",
+        "ffmpeg_path": args.ffmpeg,
+        "directories": [{"path": str(output_dir), "format": format_choice}],
+        "default_directory_index": 0,
+        "video_quality": "best",
+        "create_playlist_folder": True,
+        "cookie_source": "none",
+        "mark_as_watched": False,
+        "workers": workers,
+        "min_workers": workers,
+        "max_workers": workers,
+        "enable_logging": True,
+        "log_file_path": str(settings_dir / "log.json"),
+        "enable_notion_upload": not args.no_notion,
+        "notion_api_key": "benchmark",
+        "notion_database_id": "benchmark",
+        "enable_metadata_cache": False,
+        "retry_base_delay": args.retry_delay,
+        "retry_max_delay": args.retry_delay * 8,
+        "max_rate": args.max_rate or "",
+        "encoding_preset": args.preset or "",
+    }
+    config_path.write_text(json.dumps(config_data, ensure_ascii=False), encoding="utf-8")
+    config = YoutubeDLer.Config(config_path)
+
+    url = f"https://bench.invalid/playlist/{args.videos}"
+    manifest = YoutubeDLer.JobManifest(settings_dir / "jobs", url=url)
+    gdrive_service = FakeDriveService(base_dir / "drive") if args.dest == "gdrive" else None
+
+    start = time.perf_counter()
+    # パイプラインの出力は計測結果と混ざらないよう、--verbose以外では捨てます
+    with open(os.devnull, "w") as devnull, contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+            stack.enter_context(contextlib.redirect_stderr(devnull))
+        results, _ = YoutubeDLer.execute_jobs(
+            config, [(url, manifest)], base_dir, gdrive_service=gdrive_service
+        )
+    wall_seconds = time.perf_counter() - start
+
+    summary = summarize(settings_dir / "metrics.jsonl", results, wall_seconds)
+    if args.keep:
+        print(f"作業ディレクトリ: {base_dir}")
+    else:
+        shutil.rmtree(base_dir, ignore_errors=True)
+    return summary
+
+
+def print_table(rows):
+    """集計結果を表形式で表示する"""
+    header = ("workers", "format", "成功/総数", "動画/分", "MB/s", "p50(秒)", "p95(秒)", "経過(秒)")
+    print("\n" + " | ".join(header))
+    print("-" * 80)
+    for row in rows:
+        print(
+            " | ".join(
+                str(value)
+                for value in (
+                    row["workers"],
+                    row["format"],
+                    f"{row['succeeded']}/{row['videos']}",
+                    row["videos_per_min"],
+                    row["mb_per_s"],
+                    row["p50_latency"],
+                    row["p95_latency"],
+                    row["wall_seconds"],
+                )
+            )
+        )
+
+
+def run_startup(args):
+    """コールドスタートを計測して表示し、重いライブラリが読み込まれていれば終了コード1で終了する"""
+    print(f"YoutubeDLer.pyのコールドスタートを{args.repeat}回計測しています...")
+    summary = measure_startup(args.repeat)
+    print(f"インポート: {summary['import_ms']}ms（中央値）")
+    print(f"プロセス全体: {summary['process_ms']}ms（中央値）")
+    print(f"--show-config: {summary['show_config_ms']}ms（中央値）")
+    if args.report:
+        row = {"timestamp": datetime.now().isoformat(), "startup": True, **summary}
+        with open(args.report, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    if summary["heavy_modules"]:
+        print(f"エラー: 読み込み時に重いライブラリがインポートされています: {', '.join(summary['heavy_modules'])}")
+        sys.exit(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="ローカルの合成メディアでYoutubeDLer.pyのパイプライン全体のスループットを計測します。"
+    )
+    parser.add_argument("--videos", type=int, default=10, help="再生リストの動画数 (既定: 10)")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 4], help="計測する並列ダウンロード数 (既定: 1 4)"
+    )
+    parser.add_argument(
+        "--formats",
+        type=YoutubeDLer.format_list,
+        nargs="+",
+        default=["webm", "mp3"],
+        help="計測する形式。カンマ区切りで複数形式の同時作成も計測できます (既定: webm mp3)",
+    )
+    parser.add_argument("--dest", choices=["local", "gdrive"], default="local", help="保存先 (gdriveはフェイク)")
+    parser.add_argument("--media-seconds", type=int, default=5, help="合成するメディアの長さ（秒）")
+    parser.add_argument("--latency", type=float, default=0.0, help="HTTPリクエストごとの遅延（秒）")
+    parser.add_argument("--extract-latency", type=float, default=0.0, help="動画情報・再生リストのページ取得ごとの遅延（秒）")
+    parser.add_argument("--bandwidth", help="接続ごとの配信帯域 (例: 2M)。未指定は無制限")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 503で失敗させるリクエストの割合 (0〜1)")
+    parser.add_argument("--retry-delay", type=float, default=0.5, help="再試行の待機時間の基準（秒）")
+    parser.add_argument("--max-rate", help="パイプラインの帯域の上限 (例: 5M)")
+    parser.add_argument("--preset", choices=["fast", "balanced", "archive"], help="エンコードプリセット")
+    parser.add_argument("--no-notion", action="store_true", help="Notionのフェイクへの登録を行わない")
+    parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg"), help="ffmpegのパス")
+    parser.add_argument("--seed", type=int, default=0, help="エラー注入の乱数シード")
+    parser.add_argument("--repeat", type=int, default=1, help="各組み合わせの繰り返し回数")
+    parser.add_argument("--report", help="結果を1行ずつ追記するJSONLファイル（継続的な比較用）")
+    parser.add_argument("--keep", action="store_true", help="作業ディレクトリを削除せずに残す")
+    parser.add_argument("--verbose", action="store_true", help="パイプラインの出力を表示する")
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="YoutubeDLer.pyのコールドスタートのみを計測し、重いライブラリが読み込まれていれば失敗として終了する",
+    )
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.startup:
+        run_startup(args)
+        return
+    if not args.ffmpeg:
+        print("ffmpegが見つかりません。--ffmpegでパスを指定してください。")
+        sys.exit(1)
+    bandwidth = parse_bytes(args.bandwidth) if args.bandwidth else None
+
+    media_dir = tempfile.mkdtemp(prefix="youtubedler-media-")
+    print(f"{args.media_seconds}秒のテスト用メディアを生成しています...")
+    sizes = generate_media(args.ffmpeg, media_dir, args.media_seconds)
+    print(", ".join(f"{name}: {format_bytes(size)}" for name, size in sizes.items()))
+
+    register_extractors()
+    server = MediaServer(
+        media_dir, args.latency, bandwidth, args.error_rate, args.seed
+    ).start()
+    BenchmarkVideoIE.server = server
+    BenchmarkVideoIE.media_sizes = sizes
+    BenchmarkVideoIE.extract_latency = args.extract_latency
+    BenchmarkVideoIE.duration = args.media_seconds
+    YoutubeDLer.NotionUploader.API_URL = f"{server.base_url}/v1/pages"
+
+    rows = []
+    try:
+        for format_choice in args.formats:
+            for workers in args.workers:
+                for _ in range(args.repeat):
+                    print(f"計測中: workers={workers}, format={format_choice} ...")
+                    summary = run_case(args, server, workers, format_choice)
+                    row = {
+                        "timestamp": datetime.now().isoformat(),
+                        "workers": workers,
+                        "format": format_choice,
+                        "dest": args.dest,
+                        "media_seconds": args.media_seconds,
+                        "latency": args.latency,
+                        "bandwidth": args.bandwidth,
+                        "error_rate": args.error_rate,
+                        **summary,
+                    }
+                    rows.append(row)
+                    if args.report:
+                        with open(args.report, "a", encoding="utf-8") as f:
+                            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    finally:
+        server.stop()
+        shutil.rmtree(media_dir, ignore_errors=True)
+
+    print_table(rows)
+    print(f"\nサーバー: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""ffmpegのエンコードプリセット（YoutubeDLer.pyとwebmのmp3変換.pyで共通）"""
+
+# プリセットごとの、コーデック別のffmpeg引数
+# fastは速度優先、balancedは標準、archiveは時間をかけて品質とサイズを優先します
+ENCODING_PRESETS = {
+    "fast": {
+        "h264": ["-preset", "veryfast", "-crf", "26"],
+        "vp9": ["-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1", "-crf", "36", "-b:v", "0"],
+        "mpeg4": ["-q:v", "8"],
+        "aac": ["-b:a", "128k"],
+        "opus": ["-b:a", "96k"],
+        "mp3": ["-q:a", "5"],
+        "vorbis": ["-q:a", "3"],
+        "flac": ["-compression_level", "0"],
+    },
+    "balanced": {
+        "h264": ["-preset", "medium", "-crf", "23"],
+        "vp9": ["-deadline", "good", "-cpu-used", "4", "-row-mt", "1", "-crf", "32", "-b:v", "0"],
+        "mpeg4": ["-q:v", "5"],
+        "aac": ["-b:a", "192k"],
+        "opus": ["-b:a", "128k"],
+        "mp3": ["-q:a", "2"],
+        "vorbis": ["-q:a", "5"],
+        "flac": ["-compression_level", "5"],
+    },
+    "archive": {
+        "h264": ["-preset", "slow", "-crf", "18"],
+        "vp9": ["-deadline", "good", "-cpu-used", "1", "-row-mt", "1", "-crf", "24", "-b:v", "0"],
+        "mpeg4": ["-q:v", "2"],
+        "aac": ["-b:a", "256k"],
+        "opus": ["-b:a", "192k"],
+        "mp3": ["-q:a", "0"],
+        "vorbis": ["-q:a", "7"],
+        "flac": ["-compression_level", "12"],
+    },
+}
+
+# 出力形式ごとに、ffmpegが使用する(映像, 音声)コーデック
+FORMAT_CODECS = {
+    "mp4": ("h264", "aac"),
+    "mov": ("h264", "aac"),
+    "webm": ("vp9", "opus"),
+    "avi": ("mpeg4", "mp3"),
+    "mp3": ("mp3",),
+    "aac": ("aac",),
+    "ogg": ("vorbis",),
+    "flac": ("flac",),
+}
+
+
+def preset_args(preset, output_format):
+    """プリセットと出力形式に対応するffmpegの引数を返す（プリセットが未指定の場合は空）"""
+    if not preset:
+        return []
+    if preset not in ENCODING_PRESETS:
+        raise ValueError(
+            f"不明なエンコードプリセットです: {preset}（{', '.join(ENCODING_PRESETS)}）"
+        )
+    table = ENCODING_PRESETS[preset]
+    return [arg for codec in FORMAT_CODECS.get(output_format, ()) for arg in table[codec]]
@@ -2,9 +2,10 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 import os
 import subprocess
+from encoding_presets import ENCODING_PRESETS, preset_args
 
-def convert_file(input_file, output_dir, output_format):
-    """ffmpegを使用してファイルを指定されたフォーマットに変換する"""
+def convert_file(input_file, output_dir, output_format, preset=None, threads=None):
+    """ffmpegを使用してファイルを指定されたフォーマットに変換する（presetはfast/balanced/archive）"""
     base_name = os.path.splitext(os.path.basename(input_file))[0]
     output_file = os.path.join(output_dir, f"{base_name}.{output_format}")
 
@@ -36,6 +37,15 @@ def convert_file(input_file, output_dir, output_format):
         messagebox.showerror("エラー", f"サポートされていない出力フォーマットです: {output_format}\n対応フォーマット: {supported}")
         return
 
+    # エンコードプリセットの引数は後ろに追加し、表の品質設定を上書きする
+    try:
+        command.extend(preset_args(preset, output_format))
+    except ValueError as e:
+        messagebox.showerror("エラー", str(e))
+        return
+    if threads:
+        command.extend(['-threads', str(threads)])
+
     command.append(output_file)
 
     try:
@@ -71,13 +81,31 @@ def run_converter():
     # 入力されたフォーマット名を整形
     output_format = output_format.lower().strip().replace(".", "")
 
+    # エンコードプリセットの入力ダイアログ（空欄は従来の設定）
+    prompt_text = f"エンコードプリセットを入力してください ({', '.join(ENCODING_PRESETS)}。空欄は標準設定):"
+    preset = simpledialog.askstring("エンコードプリセット", prompt_text, parent=root)
+    if preset is None:
+        return
+    preset = preset.lower().strip() or None
+
+    # ffmpegのスレッド数の入力ダイアログ（空欄はffmpegの自動設定）
+    prompt_text = "ffmpegのスレッド数を入力してください (空欄は自動):"
+    threads = simpledialog.askstring("スレッド数", prompt_text, parent=root)
+    if threads is None:
+        return
+    threads = threads.strip()
+    if threads and (not threads.isdigit() or int(threads) < 1):
+        messagebox.showwarning("警告", "スレッド数には1以上の整数を入力してください。")
+        return
+    threads = int(threads) if threads else None
+
     # 出力先ディレクトリの選択ダイアログ
     output_dir = filedialog.askdirectory(title=f".{output_format}ファイルを保存するディレクトリを選択")
     if not output_dir:
         return
 
     # ファイル変換を実行
-    convert_file(input_file, output_dir, output_format)
+    convert_file(input_file, output_dir, output_format, preset, threads)
 
 if __name__ == "__main__":
     run_converter()
\ No newline at end of file